@@ -46,6 +46,7 @@ class LogCategory(Enum):
     SIMSTRUCTURE = "SIM_Structure"
     SIMPLANOCOMPARATOR = "SIM_Document_Comparator"
     SIMOCRSCANNER = "SIM_OCR_SCANNER"
+    MRP = "mrp"
 
 
 log_folder = _ensure_log_folder(os.getenv("LOG_FOLDER", "loggin"))
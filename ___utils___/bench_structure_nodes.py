@@ -0,0 +1,142 @@
+"""
+Benchmark de la representación de árboles de estructura.
+
+Compara, para un árbol sintético de N nodos:
+    - dict por nodo + jsonable_encoder + json.dumps (camino genérico de FastAPI)
+    - StructureNode (__slots__, códigos internados) + nodes.dumps
+
+Uso (desde la raíz del repo):
+    python ___utils___/bench_structure_nodes.py [nodos] [repeticiones]
+"""
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from app.services.SIMReader.nodes import StructureNode, dumps, orjson
+
+
+def _shape(n: int, seed: int = 7):
+    """
+    Forma del árbol: lista de (padre, codigo, cantidad, level) en pre-orden,
+    más descripción y letra de cambio por código.
+    """
+    rnd = random.Random(seed)
+    filas = [(None, "P0000000", "", 0)]
+    levels = [0]
+    for i in range(1, n):
+        padre = rnd.randrange(i)
+        filas.append((padre, f"A{i:07d}", str(rnd.choice([1, 1, 2, 4, 0.5])), levels[padre] + 1))
+        levels.append(levels[padre] + 1)
+
+    articulos = {
+        codigo: (f"DESCRIPCION DEL ARTICULO {codigo} CHAPA 2MM", rnd.choice("ABCD"))
+        for _, codigo, _, _ in filas
+    }
+    return filas, articulos
+
+
+def build_dicts(filas, articulos):
+    nodos = []
+    for padre, codigo, cantidad, level in filas:
+        descripcion, letra = articulos[codigo]
+        node = {
+            # join crea una string nueva, como las que llegan de Informix
+            "codigo": "".join(codigo),
+            "cantidad": cantidad,
+            "descripcion": descripcion,
+            "letra_cambio": letra,
+            "level": level,
+            "hijos": [],
+            "hash": "",
+        }
+        nodos.append(node)
+        if padre is not None:
+            nodos[padre]["hijos"].append(node)
+    return [nodos[0]]
+
+
+def build_nodes(filas, articulos):
+    nodos = []
+    for padre, codigo, cantidad, level in filas:
+        descripcion, letra = articulos[codigo]
+        node = StructureNode(
+            codigo=sys.intern("".join(codigo)),
+            cantidad=sys.intern(cantidad),
+            descripcion=descripcion,
+            letra_cambio=letra,
+            level=level,
+        )
+        nodos.append(node)
+        if padre is not None:
+            nodos[padre].hijos.append(node)
+    return [nodos[0]]
+
+
+def serialize_dicts(tree) -> bytes:
+    # Lo mismo que hace FastAPI al devolver el árbol desde la ruta
+    return json.dumps(
+        jsonable_encoder(tree), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def serialize_nodes(tree) -> bytes:
+    return dumps(tree)
+
+
+def _memory(build, filas, articulos) -> int:
+    gc.collect()
+    tracemalloc.start()
+    tree = build(filas, articulos)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tree
+    return current
+
+
+def _best_ms(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        start = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - start) * 1000)
+    return min(tiempos)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    filas, articulos = _shape(n)
+    arbol_dicts = build_dicts(filas, articulos)
+    arbol_nodos = build_nodes(filas, articulos)
+
+    assert json.loads(serialize_dicts(arbol_dicts)) == json.loads(serialize_nodes(arbol_nodos))
+
+    filas_tabla = [
+        ("memoria del árbol (KB)",
+         _memory(build_dicts, filas, articulos) / 1024,
+         _memory(build_nodes, filas, articulos) / 1024),
+        ("armado (ms)",
+         _best_ms(lambda: build_dicts(filas, articulos), repeticiones),
+         _best_ms(lambda: build_nodes(filas, articulos), repeticiones)),
+        ("serialización (ms)",
+         _best_ms(lambda: serialize_dicts(arbol_dicts), repeticiones),
+         _best_ms(lambda: serialize_nodes(arbol_nodos), repeticiones)),
+    ]
+
+    print(f"Árbol de {n} nodos, mejor de {repeticiones} | encoder: {'orjson' if orjson else 'json'}")
+    print(f"{'':<26}{'dict':>12}{'StructureNode':>16}{'mejora':>10}")
+    for nombre, viejo, nuevo in filas_tabla:
+        print(f"{nombre:<26}{viejo:>12.1f}{nuevo:>16.1f}{viejo / nuevo:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import os
 import pyodbc
 import re
 import time
+import threading
+from collections import deque
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
@@ -56,10 +58,300 @@ def get_db():
 # =========================
 # Configuración Informix (pyodbc con DSN)
 # =========================
+SIM_POOL_MIN_SIZE = int(os.getenv("DB_INFORMIX_POOL_MIN", 1))
+SIM_POOL_MAX_SIZE = int(os.getenv("DB_INFORMIX_POOL_MAX", 5))
+SIM_POOL_IDLE_TIMEOUT = float(os.getenv("DB_INFORMIX_POOL_IDLE_TIMEOUT", 300))
+SIM_POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_INFORMIX_POOL_TIMEOUT", 10))
+
+# Consulta mínima para verificar que la conexión sigue viva
+SIM_POOL_PING_QUERY = "SELECT 1 FROM systables WHERE tabid = 1"
+
+
+def _connect_sim():
+    """
+    Abre una conexión nueva contra el DSN de Informix.
+    """
+    conn_str = (
+        f"DSN={os.getenv('DB_INFORMIX_DSN', 'manufact64')};"
+        f"UID={os.getenv('DB_INFORMIX_UID')};"
+        f"PWD={os.getenv('DB_INFORMIX_PWD')};"
+    )
+
+    start_time = time.perf_counter()
+    conn = pyodbc.connect(conn_str)
+
+    elapsed = (time.perf_counter() - start_time) * 1000
+    logger.info(f"Conexión establecida a Informix en {elapsed:.2f} ms")
+
+    return conn
+
+
+class SimPoolTimeoutError(TimeoutError):
+    """
+    Se lanza cuando el pool está agotado y no se liberó ninguna conexión
+    dentro del tiempo de espera configurado.
+    """
+
+
+class SimConnectionPool:
+    """
+    Pool acotado de conexiones pyodbc hacia Informix.
+
+    - Mantiene entre `min_size` y `max_size` conexiones abiertas.
+    - Cierra las conexiones ociosas por más de `idle_timeout` segundos
+      (respetando siempre el mínimo).
+    - Verifica cada conexión al retirarla del pool y la reemplaza si murió.
+    - Si el pool está agotado espera hasta `checkout_timeout` segundos.
+    """
+
+    def __init__(
+        self,
+        connect=_connect_sim,
+        min_size: int = SIM_POOL_MIN_SIZE,
+        max_size: int = SIM_POOL_MAX_SIZE,
+        idle_timeout: float = SIM_POOL_IDLE_TIMEOUT,
+        checkout_timeout: float = SIM_POOL_CHECKOUT_TIMEOUT,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size debe ser al menos 1")
+
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = deque()
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        self._created = 0
+        self._closed = 0
+        self._discarded = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+
+    def warm_up(self):
+        """
+        Abre conexiones hasta alcanzar `min_size`.
+        Los errores se registran pero no se propagan.
+        """
+        conns = []
+        try:
+            while True:
+                with self._cond:
+                    if self._in_use + len(self._idle) + len(conns) >= self.min_size:
+                        break
+                conns.append(self._connect())
+                with self._cond:
+                    self._created += 1
+        except pyodbc.Error as e:
+            logger.error(f"Error al precalentar el pool de Informix: {e}")
+        finally:
+            now = time.monotonic()
+            with self._cond:
+                for conn in conns:
+                    self._idle.append((conn, now))
+                self._cond.notify_all()
+
+    def acquire(self):
+        """
+        Retira una conexión viva del pool, abriendo una nueva si hace falta.
+        """
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.checkout_timeout
+        waited = False
+        timed_out = False
+        conn = None
+        expired = []
+
+        with self._cond:
+            while True:
+                expired.extend(self._pop_expired_locked())
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    self._in_use += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    timed_out = True
+                    break
+
+                waited = True
+                self._cond.wait(remaining)
+
+        self._close_all(expired)
+
+        if timed_out:
+            raise SimPoolTimeoutError(
+                f"Pool de Informix agotado ({self.max_size} conexiones en uso) "
+                f"tras esperar {self.checkout_timeout:.1f} s"
+            )
+
+        try:
+            if conn is not None and not self._is_alive(conn):
+                logger.warning("Conexión Informix del pool inválida, se reemplaza")
+                self._discard(conn)
+                conn = None
+
+            if conn is None:
+                conn = self._connect()
+                with self._cond:
+                    self._created += 1
+
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._cond:
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_ms_total += elapsed
+            self._wait_ms_max = max(self._wait_ms_max, elapsed)
+
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        """
+        Devuelve una conexión al pool. Si `discard` es True o la conexión
+        no puede limpiarse, se cierra en lugar de reutilizarse.
+        """
+        if not discard:
+            try:
+                conn.rollback()
+            except pyodbc.Error:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((conn, time.monotonic()))
+            expired = self._pop_expired_locked()
+            self._cond.notify()
+
+        if discard:
+            self._discard(conn)
+        self._close_all(expired)
+
+    def close(self):
+        """
+        Cierra todas las conexiones ociosas del pool.
+        """
+        with self._cond:
+            conns = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        self._close_all(conns)
+
+    def stats(self) -> dict:
+        """
+        Estado actual y métricas acumuladas del pool.
+        """
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self._created,
+                "closed": self._closed,
+                "discarded": self._discarded,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_ms_avg": round(self._wait_ms_total / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_ms_max": round(self._wait_ms_max, 3),
+            }
+
+    def _pop_expired_locked(self) -> list:
+        """
+        Quita de la cola las conexiones ociosas vencidas sin bajar del mínimo.
+        Debe llamarse con el lock tomado; el cierre se hace fuera del lock.
+        """
+        expired = []
+        limit = time.monotonic() - self.idle_timeout
+
+        # Las más antiguas quedan a la izquierda de la cola
+        while (
+            self._idle
+            and self._idle[0][1] < limit
+            and self._in_use + len(self._idle) > self.min_size
+        ):
+            expired.append(self._idle.popleft()[0])
+
+        return expired
+
+    def _is_alive(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SIM_POOL_PING_QUERY)
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._cond:
+            self._discarded += 1
+        self._close_all([conn])
+
+    def _close_all(self, conns):
+        for conn in conns:
+            try:
+                conn.close()
+            except pyodbc.Error:
+                pass
+            with self._cond:
+                self._closed += 1
+        if conns:
+            logger.info(f"{len(conns)} conexión(es) Informix cerradas por el pool")
+
+
+_sim_pool = None
+_sim_pool_lock = threading.Lock()
+
+
+def get_sim_pool() -> SimConnectionPool:
+    """
+    Devuelve el pool de conexiones Informix del proceso, creándolo si no existe.
+    """
+    global _sim_pool
+
+    if _sim_pool is None:
+        with _sim_pool_lock:
+            if _sim_pool is None:
+                _sim_pool = SimConnectionPool()
+                logger.info(
+                    f"Pool Informix creado (min={_sim_pool.min_size}, max={_sim_pool.max_size})"
+                )
+
+    return _sim_pool
+
+
+def get_sim_pool_stats() -> dict:
+    """
+    Métricas del pool de conexiones Informix para diagnóstico en tiempo de ejecución.
+    """
+    return get_sim_pool().stats()
+
+
 @contextmanager
 def get_sim_db():
     """
     Retorna una conexión activa a la base de datos Informix usando DSN.
+    La conexión se toma del pool compartido y se devuelve al terminar.
     Se fuerza el modo de solo lectura para proteger la base de datos.
     Uso:
         with get_sim_db() as conn:
@@ -67,31 +359,33 @@ def get_sim_db():
             cursor.execute("SELECT ...")
             data = cursor.fetchall()
     """
-    conn = None
+    pool = get_sim_pool()
     start_time = time.perf_counter()
 
     try:
-        conn_str = (
-            f"DSN={os.getenv('DB_INFORMIX_DSN', 'manufact64')};"
-            f"UID={os.getenv('DB_INFORMIX_UID')};"
-            f"PWD={os.getenv('DB_INFORMIX_PWD')};"
-        )
-
-        conn = pyodbc.connect(conn_str)
+        conn = pool.acquire()
+    except pyodbc.Error as e:
+        logger.error(f"Error al conectar con Informix: {e}")
+        raise
 
-        elapsed = (time.perf_counter() - start_time) * 1000
-        logger.info(f"Conexión establecida a Informix en {elapsed:.2f} ms")
+    elapsed = (time.perf_counter() - start_time) * 1000
+    logger.debug(f"Conexión Informix obtenida del pool en {elapsed:.2f} ms")
 
-        yield ReadOnlyConnection(conn)
+    discard = False
+    wrapper = ReadOnlyConnection(conn)
+    try:
+        yield wrapper
 
     except pyodbc.Error as e:
-        logger.error(f"Error al conectar con Informix: {e}")
+        logger.error(f"Error en la conexión con Informix: {e}")
+        discard = True
         raise
 
     finally:
-        if conn:
-            conn.close()
-            logger.info("Conexión Informix cerrada")
+        # El envoltorio no sirve más aunque alguien lo haya guardado
+        wrapper.close()
+        pool.release(conn, discard=discard)
+        logger.debug("Conexión Informix devuelta al pool")
 
 # =========================
 # Clase de conexión solo lectura
@@ -99,15 +393,20 @@ def get_sim_db():
 class ReadOnlyConnection:
     """
     Envuelve una conexión de pyodbc para impedir cualquier operación de escritura.
+
+    La conexión real pertenece al pool: close() no la cierra, solo deja el
+    envoltorio inutilizable. La devolución al pool la hace get_sim_db.
     """
     def __init__(self, conn):
         self._conn = conn
 
     def cursor(self):
+        if self._conn is None:
+            raise RuntimeError("La conexión Informix ya fue cerrada y devuelta al pool.")
         return ReadOnlyCursor(self._conn.cursor())
 
     def close(self):
-        self._conn.close()
+        self._conn = None
 
 
 class ReadOnlyCursor:
@@ -4,29 +4,44 @@ _ = get_logger(LogArea.CORE, LogCategory.SYSTEM)
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 
 #from app.routes.gralFunctions import router as general_functions_router
 from app.routes.user import router as usuario_router
 from app.routes.structure import router as structure_router
-#from app.routes.comparation import router as comparation_router
+from app.routes.comparation import router as comparation_router
 from app.routes.documents import router as documents_router
 from app.routes.articulos import router as articulos_router
+from app.routes.sim import router as sim_router
+from app.routes.mrp import router as mrp_router
 
 from app.services.files.files_handler import start_watchdog_scheduler
+from app.services.SIMReader.snapshot import start_bom_snapshot_scheduler
+from app.services.SIMReader.article_index import start_article_index_scheduler
+from app.services.SIMReader.historia import start_bom_history_scheduler
+from app.database import get_sim_pool
 
-# variable para guardar scheduler y poder detenerlo
+# variables para guardar los schedulers y poder detenerlos
 scheduler = None
+snapshot_scheduler = None
+article_index_scheduler = None
+history_scheduler = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Contexto de ciclo de vida de la aplicación.
-    Inicia el watchdog scheduler al arrancar y lo detiene al finalizar.
+    Inicia el watchdog scheduler, precalienta el pool de Informix y arranca
+    la foto de estructuras, el índice de artículos y el historial al iniciar, y los detiene al finalizar.
     """
-    global scheduler
+    global scheduler, snapshot_scheduler, article_index_scheduler, history_scheduler
     print("App arrancó con la configuración CORS")
 
     scheduler = start_watchdog_scheduler()
+    await asyncio.to_thread(get_sim_pool().warm_up)
+    snapshot_scheduler = start_bom_snapshot_scheduler()
+    article_index_scheduler = start_article_index_scheduler()
+    history_scheduler = start_bom_history_scheduler()
 
     yield
 
@@ -35,6 +50,21 @@ async def lifespan(app: FastAPI):
         scheduler.shutdown()
         print("Scheduler detenido")
 
+    if snapshot_scheduler:
+        snapshot_scheduler.shutdown()
+        print("Scheduler de foto de estructuras detenido")
+
+    if article_index_scheduler:
+        article_index_scheduler.shutdown()
+        print("Scheduler del índice de artículos detenido")
+
+    if history_scheduler:
+        history_scheduler.shutdown()
+        print("Scheduler del historial de estructuras detenido")
+
+    get_sim_pool().close()
+    print("Pool Informix cerrado")
+
 
 app = FastAPI(title="MERP", lifespan=lifespan)
 
@@ -57,8 +87,10 @@ app.add_middleware(
 app.include_router(usuario_router)
 app.include_router(structure_router)
 app.include_router(articulos_router)
-#app.include_router(comparation_router)
+app.include_router(comparation_router)
 app.include_router(documents_router)
+app.include_router(sim_router)
+app.include_router(mrp_router)
 
 
 @app.get("/")
@@ -24,7 +24,7 @@ class ProductionConsumption(Base):
         ForeignKey("items.Id"),
         nullable=False
     )
-    quantity = Column("Quantity", Numeric(12, 4), nullable=False)
+    quantity_used = Column("QuantityUsed", Numeric(12, 4), nullable=False)
 
     production_order = relationship("ProductionOrder")
     item = relationship("Item")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Numeric, Enum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -18,6 +18,19 @@ class ProductionOrder(Base):
         ForeignKey("items.Id"),
         nullable=False
     )
-    created_at = Column("CreatedAt", DateTime, default=datetime.utcnow)
+    quantity = Column("Quantity", Numeric(12, 4), nullable=False)
+    status = Column(
+        "Status",
+        Enum("planned", "in_progress", "completed", "cancelled", "deleted"),
+        nullable=False,
+        default="planned"
+    )
+    created_at = Column("CreatedAt", DateTime, default=datetime.utcnow, nullable=False)
+    created_by = Column(
+        "CreatedBy",
+        Integer,
+        ForeignKey("users.Id"),
+        nullable=False
+    )
 
     item = relationship("Item")
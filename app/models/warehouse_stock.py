@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Numeric
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -12,11 +12,19 @@ class WarehouseStock(Base):
     __tablename__ = "warehouse_stock"
 
     id = Column("Id", Integer, primary_key=True, autoincrement=True)
+    item_id = Column(
+        "ItemId",
+        Integer,
+        ForeignKey("items.Id"),
+        nullable=False
+    )
     warehouse_location_id = Column(
         "WarehouseLocationId",
         Integer,
         ForeignKey("warehouse_locations.Id"),
         nullable=False
     )
+    quantity = Column("Quantity", Numeric(14, 4), nullable=False)
 
+    item = relationship("Item")
     warehouse_location = relationship("WarehouseLocation")
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
-from typing import List
+import json
+from fastapi import APIRouter, Query, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from app.services.SIMReader.articulos import (
     ORDERED_FIELDS,
+    BULK_MAX_CODES,
+    autocomplete_articles,
     search_articles,
-    get_articles_data
+    search_articles_ranked,
+    encode_cursor,
+    decode_cursor,
+    get_articles_data,
+    normalize_article_codes,
+    stream_articles_data
 )
 from app.services.SIMReader.estructura import (
     get_hijos,
@@ -11,7 +20,11 @@ from app.services.SIMReader.estructura import (
     get_last_level_padres,
     get_all_hijos
 )
+from app.services.SIMReader.nodes import dumps
 from app.validation import auth_required
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+logger = get_logger(LogArea.ROUTERS, LogCategory.SIMREADER)
 
 router = APIRouter(prefix="/articulos", tags=["Artículos"])
 
@@ -22,36 +35,82 @@ def search_articulo(
     value: str = Query(..., description="Valor a buscar"),
     similar: bool = Query(False, description="Si True, busca coincidencias parciales"),
     limit: int = Query(50, ge=1, le=200, description="Cantidad máxima de registros"),
-    offset: int = Query(0, ge=0, description="Desde qué registro comenzar")
+    offset: int = Query(0, ge=0, description="Desde qué registro comenzar"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (next_cursor); si se envía, se ignora offset"),
+    ranked: bool = Query(False, description="Si True, búsqueda aproximada en código y descripción ordenada por relevancia")
 ):
     """
     Busca artículos por un campo permitido y retorna código y descripción.
+    Con `ranked` la búsqueda tolera errores de tipeo y acentos, se hace
+    sobre código y descripción a la vez y cada resultado trae su `score`.
+
+    Los resultados vienen ordenados por código. `next_cursor` permite pedir
+    la página siguiente sin recorrer las anteriores (es None en la última).
     """
     try:
         if field not in ORDERED_FIELDS:
             raise HTTPException(status_code=400, detail="Campo de búsqueda no permitido.")
 
+        if ranked:
+            try:
+                results = search_articles_ranked(value, limit=limit, offset=offset)
+            except RuntimeError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+
+            return {
+                "total": len(results),
+                "limit": limit,
+                "offset": offset,
+                "ranked": True,
+                "results": results
+            }
+
         results = search_articles(
             field,
             value,
             similar=similar,
             limit=limit,
-            offset=offset
+            offset=offset,
+            after=decode_cursor(cursor) if cursor else None
         )
 
         return {
             "total": len(results),
             "limit": limit,
             "offset": offset,
+            "next_cursor": encode_cursor(results[-1]["art_articu"]) if len(results) == limit else None,
             "results": results
         }
 
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception:
         raise HTTPException(status_code=500, detail="Error interno en la búsqueda de artículos.")
 
 
+@router.get("/autocomplete", dependencies=[Depends(auth_required)])
+def autocomplete_articulo(
+    prefix: str = Query(..., min_length=1, description="Comienzo del código del artículo"),
+    limit: int = Query(10, ge=1, le=50, description="Cantidad máxima de sugerencias")
+):
+    """
+    Sugerencias de códigos que empiezan con `prefix`, con su descripción.
+    Pensado para llamarse en cada tecla de los campos de código.
+    """
+    try:
+        results = autocomplete_articles(prefix, limit=limit)
+        return {
+            "total": len(results),
+            "prefix": prefix.strip().upper(),
+            "results": results
+        }
+    except Exception:
+        logger.exception(f"ERROR /articulos/autocomplete | prefix={prefix}")
+        raise HTTPException(status_code=500, detail="Error interno en el autocompletado de artículos.")
+
+
 @router.get("/get-article-data", dependencies=[Depends(auth_required)])
 def get_articles(
     codes: str = Query(..., description="Lista de códigos separados por coma, ej: 02350-01,02351-02")
@@ -71,3 +130,58 @@ def get_articles(
         }
     except Exception:
         raise HTTPException(status_code=500, detail="Error interno al obtener los artículos.")
+
+
+def _parse_bulk_codes(body: bytes, content_type: str) -> list:
+    """
+    Códigos de un body JSON (lista o {"codigos": [...]}) o de texto con un
+    código por línea.
+    """
+    if "json" in content_type and "ndjson" not in content_type:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="JSON inválido.")
+        if isinstance(data, dict):
+            data = data.get("codigos")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="Se esperaba una lista de códigos o {\"codigos\": [...]}.")
+        return data
+
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El body debe estar en UTF-8.")
+    return text.splitlines()
+
+
+@router.post("/get-article-data/bulk", dependencies=[Depends(auth_required)])
+async def get_articles_bulk(request: Request):
+    """
+    Consulta masiva de artículos. Acepta un JSON (lista de códigos o
+    {"codigos": [...]}) o texto con un código por línea. Los códigos se
+    normalizan y se eliminan los repetidos.
+
+    Responde NDJSON, una línea {"codigo", "articulo"} por código, a medida
+    que llegan las consultas a Informix (articulo null si no existe).
+    """
+    codes = normalize_article_codes(
+        _parse_bulk_codes(await request.body(), request.headers.get("content-type", ""))
+    )
+
+    if not codes:
+        raise HTTPException(status_code=400, detail="No se proporcionaron códigos de artículos.")
+    if len(codes) > BULK_MAX_CODES:
+        raise HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_CODES} códigos por consulta.")
+
+    logger.debug(f"/articulos/get-article-data/bulk llamado | codigos={len(codes)}")
+
+    def ndjson():
+        try:
+            for record in stream_articles_data(codes):
+                yield dumps(record) + b"\n"
+        except Exception:
+            logger.exception(f"ERROR /articulos/get-article-data/bulk | codigos={len(codes)}")
+            raise
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
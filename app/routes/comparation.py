@@ -0,0 +1,73 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Query, HTTPException, Depends
+from app.services.SIMReader.comparation import compare_structures, diff_structures
+from app.schemas.structure import StructureCompareRequest
+from app.validation import auth_required
+
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+logger = get_logger(LogArea.SERVICES, LogCategory.SIMSTRUCTURE)
+
+router = APIRouter(prefix="/comparation", tags=["Comparación"])
+
+
+@router.post("/estructuras", dependencies=[Depends(auth_required)])
+def compare_estructuras(body: StructureCompareRequest):
+    """
+    Compara las estructuras de varios artículos y marca en cada árbol los
+    componentes nuevos o faltantes respecto de los demás.
+    """
+    logger.debug(f"/comparation/estructuras llamado | codigos={body.codigos}")
+
+    try:
+        results = compare_structures(body.codigos)
+
+        logger.debug(
+            f"/comparation/estructuras OK | estructuras={len(results['compared'])} "
+            f"| diferencias={len(results['differences'])}"
+        )
+
+        return results
+
+    except Exception as e:
+        logger.exception(f"ERROR /comparation/estructuras | codigos={body.codigos}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al comparar las estructuras."
+        )
+
+
+@router.get("/diff", dependencies=[Depends(auth_required)])
+def diff_estructuras(
+    codigo_a: str = Query(..., description="Código del primer artículo"),
+    codigo_b: str = Query(..., description="Código del segundo artículo"),
+    fecha_a: Optional[date] = Query(None, description="Fecha de la primera estructura (vacío = vigente)"),
+    fecha_b: Optional[date] = Query(None, description="Fecha de la segunda estructura (vacío = vigente)"),
+):
+    """
+    Devuelve los hijos agregados, eliminados o con otra cantidad entre dos
+    estructuras, salteando los subárboles idénticos. Con `fecha_a` y
+    `fecha_b` se compara un mismo artículo en dos fechas.
+    """
+    logger.debug(
+        f"/comparation/diff llamado | codigo_a={codigo_a} | codigo_b={codigo_b} "
+        f"| fecha_a={fecha_a} | fecha_b={fecha_b}"
+    )
+
+    try:
+        results = diff_structures(codigo_a, codigo_b, fecha_a, fecha_b)
+
+        logger.debug(
+            f"/comparation/diff OK | iguales={results['iguales']} | cambios={len(results['cambios'])}"
+        )
+
+        return results
+
+    except Exception as e:
+        logger.exception(f"ERROR /comparation/diff | codigo_a={codigo_a} | codigo_b={codigo_b}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al comparar las estructuras."
+        )
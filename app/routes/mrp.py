@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Query, HTTPException, Depends
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.services.mrp.net_requirements import run_net_requirements
+from app.validation import auth_required
+
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+logger = get_logger(LogArea.ROUTERS, LogCategory.MRP)
+
+router = APIRouter(prefix="/mrp", tags=["MRP"])
+
+
+@router.get("/net-requirements", dependencies=[Depends(auth_required)])
+def get_net_requirements(
+    include_zero: bool = Query(False, description="Si True, incluye los ítems sin demanda"),
+    db: Session = Depends(get_db),
+):
+    """
+    Calcula las necesidades netas de materiales para las órdenes de
+    producción abiertas, descontando el stock de todas las ubicaciones.
+    """
+    logger.debug(f"/mrp/net-requirements llamado | include_zero={include_zero}")
+
+    try:
+        results = run_net_requirements(db, include_zero=include_zero)
+
+        logger.debug(
+            f"/mrp/net-requirements OK | ordenes={results['open_orders']} | items={results['total']}"
+        )
+
+        return results
+
+    except Exception as e:
+        logger.exception("ERROR /mrp/net-requirements")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al calcular las necesidades netas."
+        )
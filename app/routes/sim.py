@@ -0,0 +1,137 @@
+from fastapi import APIRouter, Depends
+
+from app.database import get_sim_pool_stats
+from app.services.SIMReader.snapshot import get_bom_snapshot_stats
+from app.services.SIMReader.historia import get_bom_history_stats
+from app.services.SIMReader.low_level import get_bom_levels_stats
+from app.services.SIMReader.shared_components import get_shared_components_stats
+from app.services.SIMReader.article_index import get_article_index_stats
+from app.services.SIMReader.explosion import get_explosion_cache_stats
+from app.services.SIMReader.articulos import (
+    get_article_cache_stats,
+    invalidate_article_cache,
+    get_autocomplete_stats,
+)
+from app.services.SIMReader.estructura import (
+    get_roots_memo_stats,
+    invalidate_last_level_padres,
+    get_structure_cache_stats,
+    invalidate_structure_cache,
+)
+from app.validation import auth_required
+
+router = APIRouter(prefix="/sim", tags=["SIM"])
+
+
+@router.get("/pool", dependencies=[Depends(auth_required)])
+def get_pool_stats():
+    """
+    Devuelve el estado del pool de conexiones Informix
+    (conexiones en uso, ociosas y tiempos de espera).
+    """
+    return get_sim_pool_stats()
+
+
+@router.get("/snapshot", dependencies=[Depends(auth_required)])
+def get_snapshot_stats():
+    """
+    Devuelve la versión, tamaño y último refresco de la foto de estructuras.
+    """
+    return get_bom_snapshot_stats()
+
+
+@router.get("/historia", dependencies=[Depends(auth_required)])
+def get_historia_stats():
+    """
+    Devuelve el tamaño y la última carga del historial de estructuras.
+    """
+    return get_bom_history_stats()
+
+
+@router.get("/niveles", dependencies=[Depends(auth_required)])
+def get_niveles_stats():
+    """
+    Devuelve el estado del cálculo de low-level codes y ciclos.
+    """
+    return get_bom_levels_stats()
+
+
+@router.get("/compartidos", dependencies=[Depends(auth_required)])
+def get_compartidos_stats():
+    """
+    Devuelve el estado de los bitmaps de componentes compartidos.
+    """
+    return get_shared_components_stats()
+
+
+@router.get("/articulos", dependencies=[Depends(auth_required)])
+def get_articulos_index_stats():
+    """
+    Devuelve el tamaño y último refresco del índice de artículos en memoria.
+    """
+    return get_article_index_stats()
+
+
+@router.get("/articulos-cache", dependencies=[Depends(auth_required)])
+def get_articulos_cache_stats():
+    """
+    Devuelve el estado del cache de artículos y cuánto se consultó Informix.
+    """
+    return get_article_cache_stats()
+
+
+@router.delete("/articulos-cache", dependencies=[Depends(auth_required)])
+def clear_articulos_cache():
+    """
+    Vacía el cache de artículos.
+    """
+    return {"invalidated": invalidate_article_cache()}
+
+
+@router.get("/autocomplete", dependencies=[Depends(auth_required)])
+def get_autocomplete_latency():
+    """
+    Devuelve los percentiles de latencia del autocompletado de artículos.
+    """
+    return get_autocomplete_stats()
+
+
+@router.get("/ancestros", dependencies=[Depends(auth_required)])
+def get_ancestros_memo_stats():
+    """
+    Devuelve el estado del memo de padres de último nivel.
+    """
+    return get_roots_memo_stats()
+
+
+@router.delete("/ancestros/{codigo}", dependencies=[Depends(auth_required)])
+def invalidate_ancestros(codigo: str):
+    """
+    Invalida las entradas del memo de padres de último nivel
+    que dependen del código indicado.
+    """
+    return {"invalidated": invalidate_last_level_padres([codigo])}
+
+
+@router.get("/estructura-cache", dependencies=[Depends(auth_required)])
+def get_estructura_cache_stats():
+    """
+    Devuelve el estado y la tasa de aciertos del cache de estructuras.
+    """
+    return get_structure_cache_stats()
+
+
+@router.delete("/estructura-cache/{codigo}", dependencies=[Depends(auth_required)])
+def invalidate_estructura_cache(codigo: str):
+    """
+    Descarta del cache todas las estructuras que contienen el código indicado.
+    """
+    return {"invalidated": invalidate_structure_cache([codigo])}
+
+
+@router.get("/explosion-cache", dependencies=[Depends(auth_required)])
+def get_explosion_cache():
+    """
+    Devuelve el estado y la tasa de aciertos del cache de explosiones.
+    """
+    return get_explosion_cache_stats()
@@ -1,10 +1,29 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Query, HTTPException, Depends, Response, Header
+from fastapi.responses import StreamingResponse
 from app.services.SIMReader.estructura import (
     get_hijos,
     get_padres,
     get_last_level_padres,
-    get_all_hijos
+    get_all_hijos_cached,
+    get_all_hijos_batch,
+    get_structure_hash,
+    get_structure_dag,
+    get_structure_levels,
+    stream_all_hijos
+)
+from app.services.SIMReader.where_used import get_where_used
+from app.services.SIMReader.explosion import get_exploded_bom
+from app.services.SIMReader.low_level import get_low_level_code, get_cycle_report
+from app.services.SIMReader.shared_components import (
+    get_common_components,
+    get_unique_components,
+    get_products_containing,
 )
+from app.services.SIMReader.nodes import dumps
+from app.schemas.structure import StructureBatchRequest
 from app.validation import auth_required
 
 from ___loggin___.logger import get_logger, LogArea, LogCategory
@@ -14,18 +33,34 @@ logger = get_logger(LogArea.SERVICES, LogCategory.SIMSTRUCTURE)
 router = APIRouter()
 
 
+def _cache_status_header(status: str) -> str:
+    """
+    Valor del header Cache-Status (RFC 9211) para el cache de estructuras.
+    """
+    return "MERP-estructura; hit" if status == "hit" else f"MERP-estructura; fwd={status}"
+
+
+def _etag(version: str) -> str:
+    """
+    ETag débil a partir de un hash: la versión del árbol servido en
+    /estructura (ver get_tree_version) o el hash del subárbol en /estructura/hash.
+    """
+    return f'W/"{version}"'
+
+
 @router.get("/GetHijos", dependencies=[Depends(auth_required)])
 def get_structure_hijos(
     padre_code: str = Query(..., description="Código del artículo padre (est_padre)"),
+    fecha: Optional[date] = Query(None, description="Fecha a la que se quiere la estructura (vacío = vigente)"),
 ):
     """
     Devuelve los artículos hijos y sus cantidades donde est_fechas es NULL
-    para un artículo padre dado.
+    para un artículo padre dado, o los vigentes en `fecha` si se indica.
     """
-    logger.debug(f"GetHijos llamado | padre_code={padre_code}")
+    logger.debug(f"GetHijos llamado | padre_code={padre_code} | fecha={fecha}")
 
     try:
-        results = get_hijos(padre_code)
+        results = get_hijos(padre_code, fecha)
 
         if results:
             logger.debug(f"GetHijos OK | padre_code={padre_code} | total={len(results)}")
@@ -49,15 +84,16 @@ def get_structure_hijos(
 @router.get("/GetPadres", dependencies=[Depends(auth_required)])
 def get_structure_padres(
     hijo_code: str = Query(..., description="Código del artículo hijo (est_hijo)"),
+    fecha: Optional[date] = Query(None, description="Fecha a la que se quiere la estructura (vacío = vigente)"),
 ):
     """
     Devuelve los artículos padres donde est_fechas es NULL
-    para un artículo hijo dado.
+    para un artículo hijo dado, o los vigentes en `fecha` si se indica.
     """
-    logger.debug(f"GetPadres llamado | hijo_code={hijo_code}")
+    logger.debug(f"GetPadres llamado | hijo_code={hijo_code} | fecha={fecha}")
 
     try:
-        results = get_padres(hijo_code)
+        results = get_padres(hijo_code, fecha)
 
         if results:
             logger.debug(f"GetPadres OK | hijo_code={hijo_code} | total={len(results)}")
@@ -77,6 +113,34 @@ def get_structure_padres(
         )
 
 
+@router.get("/GetWhereUsed", dependencies=[Depends(auth_required)])
+def get_structure_where_used(
+    hijo_code: str = Query(..., description="Código del componente (est_hijo)"),
+):
+    """
+    Devuelve todos los conjuntos y productos finales que usan un componente,
+    con la cantidad del componente por unidad de cada uno.
+    """
+    logger.debug(f"GetWhereUsed llamado | hijo_code={hijo_code}")
+
+    try:
+        results = get_where_used(hijo_code)
+
+        if results["total"]:
+            logger.debug(f"GetWhereUsed OK | hijo_code={hijo_code} | total={results['total']}")
+        else:
+            logger.warning(f"GetWhereUsed sin resultados | hijo_code={hijo_code}")
+
+        return results
+
+    except Exception as e:
+        logger.exception(f"ERROR GetWhereUsed | hijo_code={hijo_code}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al obtener dónde se usa el artículo."
+        )
+
+
 @router.get("/GetLastLevelPadres", dependencies=[Depends(auth_required)])
 def get_structure_last_level_padres(
     hijo_code: str = Query(..., description="Código del artículo hijo")
@@ -84,6 +148,9 @@ def get_structure_last_level_padres(
     """
     Devuelve únicamente los padres de último nivel (sin padres por encima)
     para un artículo hijo dado.
+
+    Sin foto de estructuras el resultado puede tener hasta
+    SIM_ROOTS_MEMO_TTL_MINUTES de antigüedad (ver get_last_level_padres).
     """
     logger.debug(f"GetLastLevelPadres llamado | hijo_code={hijo_code}")
 
@@ -114,16 +181,41 @@ def get_structure_last_level_padres(
 
 @router.get("/estructura", dependencies=[Depends(auth_required)])
 def get_structure_all_hijos(
-    codigo: str = Query(..., description="Código del artículo padre")
+    codigo: str = Query(..., description="Código del artículo padre"),
+    stream: bool = Query(False, description="Si True, emite los nodos en pre-orden como NDJSON"),
+    fecha: Optional[date] = Query(None, description="Fecha a la que se quiere la estructura (vacío = vigente)"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    logger.debug(f"/estructura llamado | codigo={codigo}")
+    logger.debug(f"/estructura llamado | codigo={codigo} | stream={stream} | fecha={fecha}")
 
     try:
-        results = get_all_hijos(codigo)
+        if stream:
+            records = stream_all_hijos(codigo, fecha=fecha)
+
+            def ndjson():
+                try:
+                    for record in records:
+                        yield dumps(record) + b"\n"
+                except Exception:
+                    logger.exception(f"ERROR /estructura (stream) | codigo={codigo}")
+                    raise
+
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+        results, version, cache_status = get_all_hijos_cached(codigo, fecha)
+        headers = {"Cache-Status": _cache_status_header(cache_status)}
+
+        if results:
+            # Incluye descripción y letra de cambio: el hash de estructura solo no las ve
+            etag = _etag(version)
+            headers["ETag"] = etag
+
+            if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+                return Response(status_code=304, headers=headers)
 
         if results:
             logger.debug(
-                f"/estructura OK | codigo={codigo} | nodos_raiz={len(results)}"
+                f"/estructura OK | codigo={codigo} | nodos_raiz={len(results)} | cache={cache_status}"
             )
             logger.debug(results)
         else:
@@ -131,7 +223,8 @@ def get_structure_all_hijos(
                 f"/estructura sin resultados | codigo={codigo}"
             )
 
-        return results
+        # Los nodos se serializan directo a bytes, sin pasar por jsonable_encoder
+        return Response(content=dumps(results), media_type="application/json", headers=headers)
 
     except Exception as e:
         logger.exception(f"ERROR /estructura | codigo={codigo}")
@@ -139,3 +232,265 @@ def get_structure_all_hijos(
             status_code=500,
             detail="Error interno al obtener todos los hijos."
         )
+
+
+@router.post("/estructura/batch", dependencies=[Depends(auth_required)])
+def get_structure_batch(body: StructureBatchRequest):
+    """
+    Devuelve el árbol completo de hijos de varios artículos a la vez.
+    Las estructuras se recorren juntas y la descripción de los artículos
+    se consulta una sola vez para todos los árboles.
+    """
+    logger.debug(f"/estructura/batch llamado | codigos={len(body.codigos)}")
+
+    try:
+        results = get_all_hijos_batch(body.codigos)
+
+        logger.debug(f"/estructura/batch OK | raices={len(results)}")
+
+        return Response(
+            content=dumps({
+                "total": len(results),
+                "results": results,
+            }),
+            media_type="application/json",
+        )
+
+    except Exception as e:
+        logger.exception(f"ERROR /estructura/batch | codigos={len(body.codigos)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al obtener las estructuras."
+        )
+
+
+@router.get("/estructura/hash", dependencies=[Depends(auth_required)])
+def get_structure_hash_route(
+    response: Response,
+    codigo: str = Query(..., description="Código del artículo padre")
+):
+    """
+    Devuelve el hash del subárbol de un artículo. Dos artículos con el
+    mismo hash tienen exactamente los mismos hijos y cantidades.
+    """
+    logger.debug(f"/estructura/hash llamado | codigo={codigo}")
+
+    try:
+        structure_hash = get_structure_hash(codigo)
+        response.headers["ETag"] = _etag(structure_hash)
+
+        return {
+            "codigo": codigo.strip().upper(),
+            "hash": structure_hash,
+        }
+
+    except Exception as e:
+        logger.exception(f"ERROR /estructura/hash | codigo={codigo}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al calcular el hash de la estructura."
+        )
+
+
+@router.get("/estructura/ciclos", dependencies=[Depends(auth_required)])
+def get_structure_cycles():
+    """
+    Devuelve los ciclos encontrados en manufact.est (códigos que terminan
+    siendo hijos de sí mismos), con las relaciones que los forman.
+    """
+    logger.debug("/estructura/ciclos llamado")
+
+    try:
+        results = get_cycle_report()
+
+        if results["total"]:
+            logger.warning(f"/estructura/ciclos | ciclos={results['total']}")
+
+        return results
+
+    except Exception as e:
+        logger.exception("ERROR /estructura/ciclos")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al buscar ciclos en las estructuras."
+        )
+
+
+@router.get("/estructura/low-level-code", dependencies=[Depends(auth_required)])
+def get_structure_low_level_code(
+    codigo: str = Query(..., description="Código del artículo")
+):
+    """
+    Devuelve el low-level code de un artículo: el nivel más profundo en el
+    que aparece dentro de cualquier producto.
+    """
+    logger.debug(f"/estructura/low-level-code llamado | codigo={codigo}")
+
+    try:
+        return get_low_level_code(codigo)
+
+    except Exception as e:
+        logger.exception(f"ERROR /estructura/low-level-code | codigo={codigo}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al calcular el low-level code."
+        )
+
+
+@router.get("/estructura/compartidos", dependencies=[Depends(auth_required)])
+def get_structure_common_components(
+    min_productos: int = Query(2, ge=1, description="Cantidad mínima de productos que usan el componente"),
+    limit: int = Query(500, ge=1, le=10000, description="Máximo de componentes a devolver")
+):
+    """
+    Devuelve los componentes usados por al menos `min_productos` productos
+    de primer nivel, de los más compartidos a los menos.
+    """
+    logger.debug(f"/estructura/compartidos llamado | min_productos={min_productos} | limit={limit}")
+
+    try:
+        results = get_common_components(min_productos, limit=limit)
+        logger.debug(f"/estructura/compartidos OK | total={results['total']}")
+        return results
+
+    except Exception as e:
+        logger.exception(f"ERROR /estructura/compartidos | min_productos={min_productos}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al buscar componentes compartidos."
+        )
+
+
+@router.get("/estructura/compartidos/unicos", dependencies=[Depends(auth_required)])
+def get_structure_unique_components(
+    producto: str = Query(..., description="Código del producto de primer nivel")
+):
+    """
+    Devuelve los componentes que solo aparecen en el producto indicado.
+    """
+    logger.debug(f"/estructura/compartidos/unicos llamado | producto={producto}")
+
+    try:
+        results = get_unique_components(producto)
+
+        if not results["es_producto"]:
+            logger.warning(f"/estructura/compartidos/unicos | {producto} no es un producto de primer nivel")
+
+        return results
+
+    except Exception as e:
+        logger.exception(f"ERROR /estructura/compartidos/unicos | producto={producto}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al buscar componentes únicos."
+        )
+
+
+@router.get("/estructura/compartidos/productos", dependencies=[Depends(auth_required)])
+def get_structure_products_containing(
+    componentes: str = Query(..., description="Códigos de componentes separados por coma")
+):
+    """
+    Devuelve los productos de primer nivel que contienen todos los
+    componentes indicados.
+    """
+    logger.debug(f"/estructura/compartidos/productos llamado | componentes={componentes}")
+
+    try:
+        results = get_products_containing(componentes.split(","))
+
+        if results["no_encontrados"]:
+            logger.warning(
+                f"/estructura/compartidos/productos | no encontrados={results['no_encontrados']}"
+            )
+
+        return results
+
+    except Exception as e:
+        logger.exception(f"ERROR /estructura/compartidos/productos | componentes={componentes}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al buscar productos por componentes."
+        )
+
+
+@router.get("/estructura/explosion", dependencies=[Depends(auth_required)])
+def get_structure_exploded(
+    codigo: str = Query(..., description="Código del artículo padre"),
+    cantidad: float = Query(1, gt=0, description="Cantidad a fabricar del artículo padre"),
+):
+    """
+    Devuelve la cantidad total de cada componente (hojas e intermedios)
+    necesaria para fabricar la cantidad indicada del artículo.
+    """
+    logger.debug(f"/estructura/explosion llamado | codigo={codigo} | cantidad={cantidad}")
+
+    try:
+        results = get_exploded_bom(codigo, cantidad)
+
+        if not results["total"]:
+            logger.warning(f"/estructura/explosion sin resultados | codigo={codigo}")
+
+        return results
+
+    except Exception as e:
+        logger.exception(f"ERROR /estructura/explosion | codigo={codigo}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al calcular la explosión de la estructura."
+        )
+
+
+@router.get("/estructura/dag", dependencies=[Depends(auth_required)])
+def get_structure_as_dag(
+    codigo: str = Query(..., description="Código del artículo padre")
+):
+    """
+    Devuelve la estructura como grafo: cada subconjunto distinto se describe
+    una sola vez y sus apariciones lo referencian por código.
+    """
+    logger.debug(f"/estructura/dag llamado | codigo={codigo}")
+
+    try:
+        results = get_structure_dag(codigo)
+
+        logger.debug(
+            f"/estructura/dag OK | codigo={codigo} | nodos={results['total_nodos']}"
+        )
+
+        return results
+
+    except Exception as e:
+        logger.exception(f"ERROR /estructura/dag | codigo={codigo}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al obtener la estructura como grafo."
+        )
+
+
+@router.get("/estructura/niveles", dependencies=[Depends(auth_required)])
+def get_structure_by_levels(
+    codigo: str = Query(..., description="Código del artículo padre"),
+    max_depth: int = Query(2, ge=0, le=50, description="Cantidad de niveles a devolver"),
+    expand: Optional[List[str]] = Query(None, description="Códigos cuyos subárboles se quieren expandir"),
+):
+    """
+    Devuelve la estructura hasta `max_depth` niveles, con `has_children` y
+    `child_count` por nodo para que el cliente pida los subárboles más
+    profundos con `expand`.
+    """
+    logger.debug(f"/estructura/niveles llamado | codigo={codigo} | max_depth={max_depth} | expand={expand}")
+
+    try:
+        results = get_structure_levels(codigo, max_depth=max_depth, expand=expand)
+
+        logger.debug(f"/estructura/niveles OK | codigo={codigo} | raices={len(results)}")
+
+        return results
+
+    except Exception as e:
+        logger.exception(f"ERROR /estructura/niveles | codigo={codigo}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al obtener los niveles de la estructura."
+        )
@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class StructureBatchRequest(BaseModel):
+    codigos: List[str] = Field(..., min_length=1, description="Códigos de los artículos padre")
+
+
+class StructureCompareRequest(BaseModel):
+    codigos: List[str] = Field(..., min_length=2, description="Códigos de los artículos a comparar")
@@ -0,0 +1,514 @@
+import os
+import re
+import time
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from dotenv import load_dotenv
+
+from app.database import get_sim_db
+from app.services.SIMReader.informix import normalize_text
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+load_dotenv()
+
+logger = get_logger(LogArea.SIM, LogCategory.SIMREADER)
+
+ARTICLE_INDEX_ENABLED = os.getenv("SIM_ARTICLE_INDEX", "true").lower() == "true"
+ARTICLE_INDEX_REFRESH_MINUTES = float(os.getenv("SIM_ARTICLE_INDEX_REFRESH_MINUTES", 30))
+# Pasado este múltiplo del intervalo sin refrescar, el índice deja de usarse
+ARTICLE_INDEX_MAX_AGE_FACTOR = 3
+
+# Campos indexados; el resto se sigue buscando en Informix
+INDEXED_FIELDS = ("art_articu", "art_descr1")
+
+# Largo de los n-gramas del índice invertido
+NGRAM = 3
+
+# Filas leídas por viaje al traer manufact.art completa
+FETCH_BATCH_SIZE = 5000
+
+# Búsqueda aproximada: candidatos a puntuar, tiempo máximo de puntaje y puntaje mínimo
+FUZZY_MAX_CANDIDATES = 200
+FUZZY_TIME_BUDGET_MS = 25
+FUZZY_MIN_SCORE = 0.5
+# N-gramas presentes en más de esta fracción del catálogo no sirven para filtrar
+FUZZY_COMMON_GRAM_RATIO = 0.2
+
+_TOKEN_SPLIT = re.compile(r"[^0-9A-Z]+")
+
+
+def _fold(val) -> str:
+    """
+    Mayúsculas sin acentos ni diacríticos (CAÑO -> CANO, ÁNGULO -> ANGULO).
+    """
+    text = unicodedata.normalize("NFKD", normalize_text(val))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _tokens(text: str) -> List[str]:
+    # Sin ceros a la izquierda en las partes numéricas: 2350-1 es 02350-01
+    return [t.lstrip("0") or "0" if t.isdigit() else t for t in _TOKEN_SPLIT.split(text) if t]
+
+
+def _token_grams(tokens: List[str]) -> set:
+    # Con bordes marcados, los tokens de 1 o 2 caracteres también tienen n-gramas
+    grams = set()
+    for token in tokens:
+        padded = f"^{token}$"
+        grams.update(padded[k:k + NGRAM] for k in range(max(len(padded) - NGRAM + 1, 1)))
+    return grams
+
+
+def _levenshtein(a: str, b: str, max_dist: int) -> int:
+    """
+    Distancia de edición entre `a` y `b`, o max_dist + 1 si la supera (se
+    corta en cuanto ninguna fila puede bajar de max_dist).
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if len(a) - len(b) > max_dist:
+        return max_dist + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_dist:
+            return max_dist + 1
+        previous = current
+    return previous[-1]
+
+
+def _similarity(query: str, target: str) -> float:
+    """
+    1 - distancia de edición normalizada, o 0 si queda por debajo de
+    FUZZY_MIN_SCORE. Un prefijo cuenta casi como igual, así las
+    abreviaturas (TORN, ARAND) encuentran la palabra.
+    """
+    if query == target:
+        return 1.0
+    if len(query) >= 3 and target.startswith(query):
+        return 0.9
+
+    longest = max(len(query), len(target))
+    max_dist = int((1.0 - FUZZY_MIN_SCORE) * longest)
+
+    # Cada caracter que no aparece en el otro texto es al menos una edición
+    present = set(target)
+    if sum(c not in present for c in query) > max_dist:
+        return 0.0
+
+    dist = _levenshtein(query, target, max_dist)
+    return 0.0 if dist > max_dist else 1.0 - dist / longest
+
+
+def _build_postings(doc_grams):
+    """
+    Posting lists de los n-gramas de cada documento, en formato CSR: los
+    documentos que tienen el n-grama con slot s son
+    ids[offsets[s]:offsets[s + 1]], en orden.
+    """
+    postings = {}
+    for i, grams in enumerate(doc_grams):
+        for gram in grams:
+            postings.setdefault(gram, []).append(i)
+
+    slots = {}
+    offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+    for slot, (gram, ids) in enumerate(postings.items()):
+        slots[gram] = slot
+        offsets[slot + 1] = offsets[slot] + len(ids)
+
+    ids = np.fromiter(
+        (i for ids in postings.values() for i in ids),
+        dtype=np.int32,
+        count=int(offsets[-1]),
+    )
+    return slots, offsets, ids
+
+
+class _FieldIndex:
+    """
+    Índice de un campo: para cada n-grama la lista ordenada de artículos que
+    lo contienen (posting list), todas guardadas en un solo arreglo en
+    formato CSR, y un dict valor -> artículos para la búsqueda exacta.
+    """
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+
+        exact = {}
+        for i, text in enumerate(texts):
+            exact.setdefault(text, []).append(i)
+        self.exact = {text: tuple(ids) for text, ids in exact.items()}
+
+        self.slots, self.offsets, self.ids = _build_postings(
+            {text[k:k + NGRAM] for k in range(len(text) - NGRAM + 1)} for text in texts
+        )
+
+    def _posting(self, gram: str) -> Optional[np.ndarray]:
+        slot = self.slots.get(gram)
+        if slot is None:
+            return None
+        return self.ids[self.offsets[slot]:self.offsets[slot + 1]]
+
+    def candidates(self, value: str) -> Optional[np.ndarray]:
+        """
+        Artículos que tienen todos los n-gramas de `value`, en orden. None si
+        `value` es más corto que un n-grama (no se puede filtrar).
+        """
+        grams = {value[k:k + NGRAM] for k in range(len(value) - NGRAM + 1)}
+        if not grams:
+            return None
+
+        postings = []
+        for gram in grams:
+            posting = self._posting(gram)
+            if posting is None:
+                return np.empty(0, dtype=np.int32)
+            postings.append(posting)
+
+        postings.sort(key=len)
+        result = postings[0]
+        for posting in postings[1:]:
+            result = np.intersect1d(result, posting, assume_unique=True)
+            if not result.size:
+                break
+        return result
+
+    def substring(self, value: str, stop: int, first: int = 0) -> List[int]:
+        """
+        Primeros `stop` artículos desde el id `first` cuyo valor contiene `value`.
+        """
+        candidates = self.candidates(value)
+        texts = self.texts
+        if candidates is None:
+            ids = range(first, len(texts))
+        else:
+            ids = candidates[np.searchsorted(candidates, first):].tolist()
+
+        matches = []
+        for i in ids:
+            # Los n-gramas no garantizan el orden: se verifica el valor completo
+            if value in texts[i]:
+                matches.append(i)
+                if len(matches) >= stop:
+                    break
+        return matches
+
+    @property
+    def posting_entries(self) -> int:
+        return int(self.ids.size)
+
+
+class _FuzzyIndex:
+    """
+    Índice para la búsqueda aproximada sobre código y descripción juntos.
+
+    Cada artículo se reduce a tokens sin acentos (las partes del código,
+    el código sin separadores y las palabras de la descripción) y se
+    indexan sus n-gramas con bordes. Los candidatos son los artículos que
+    más n-gramas comparten con la búsqueda; solo esos se puntúan.
+    """
+
+    def __init__(self, codes: List[str], descrs: List[str]):
+        self.code_keys = []
+        self.tokens = []
+
+        for code, descr in zip(codes, descrs):
+            code = _fold(code)
+            code_tokens = _tokens(code)
+            code_key = "".join(code_tokens)
+            self.code_keys.append(code_key)
+            self.tokens.append(tuple(dict.fromkeys(code_tokens + [code_key] + _tokens(_fold(descr)))))
+
+        self.slots, self.offsets, self.ids = _build_postings(_token_grams(t) for t in self.tokens)
+        self.max_posting = max(int(len(codes) * FUZZY_COMMON_GRAM_RATIO), FUZZY_MAX_CANDIDATES)
+
+    def candidates(self, query_tokens: List[str]) -> np.ndarray:
+        """
+        Hasta FUZZY_MAX_CANDIDATES artículos, de los que más n-gramas
+        comparten con la búsqueda a los que menos.
+        """
+        postings = []
+        for gram in _token_grams(query_tokens):
+            slot = self.slots.get(gram)
+            if slot is not None:
+                postings.append(self.ids[self.offsets[slot]:self.offsets[slot + 1]])
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+
+        # Los n-gramas muy comunes se descartan salvo que sean los únicos
+        selective = [p for p in postings if len(p) <= self.max_posting]
+        postings = selective or [min(postings, key=len)[:self.max_posting]]
+
+        counts = np.bincount(np.concatenate(postings))
+        hits = np.flatnonzero(counts)
+        if hits.size > FUZZY_MAX_CANDIDATES:
+            hits = np.sort(hits[np.argpartition(-counts[hits], FUZZY_MAX_CANDIDATES - 1)[:FUZZY_MAX_CANDIDATES]])
+        return hits[np.argsort(-counts[hits], kind="stable")]
+
+    def score(self, i: int, query_key: str, query_tokens: List[str], memo: dict) -> float:
+        """
+        Mayor entre la similitud del código completo y el promedio, por
+        token buscado, de su mejor coincidencia entre los tokens del artículo.
+        `memo` guarda las similitudes ya calculadas durante una búsqueda: las
+        palabras de las descripciones se repiten mucho entre artículos.
+        """
+        def similarity(q, t):
+            key = (q, t)
+            value = memo.get(key)
+            if value is None:
+                value = memo[key] = _similarity(q, t)
+            return value
+
+        code_score = similarity(query_key, self.code_keys[i])
+        tokens = self.tokens[i]
+        token_score = sum(max(similarity(q, t) for t in tokens) for q in query_tokens) / len(query_tokens)
+        return max(code_score, token_score)
+
+    @property
+    def posting_entries(self) -> int:
+        return int(self.ids.size)
+
+
+class ArticleIndex:
+    """
+    Foto de manufact.art (código y descripción) ordenada por código, con un
+    índice de n-gramas por campo para responder search_articles sin
+    consultar Informix.
+    """
+
+    def __init__(self, rows):
+        start = time.perf_counter()
+
+        rows = sorted(
+            ((normalize_text(codigo), codigo, descr) for codigo, descr in rows if normalize_text(codigo)),
+            key=lambda r: r[0],
+        )
+
+        self.raw_codes = [r[1] for r in rows]
+        self.raw_descr = [r[2] for r in rows]
+        self.fields = {
+            "art_articu": _FieldIndex([r[0] for r in rows]),
+            "art_descr1": _FieldIndex([normalize_text(r[2]) for r in rows]),
+        }
+        self.fuzzy = _FuzzyIndex(self.fields["art_articu"].texts, self.raw_descr)
+
+        self.loaded_at = datetime.now()
+        self._loaded_monotonic = time.monotonic()
+        self.build_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    def __len__(self) -> int:
+        return len(self.raw_codes)
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self._loaded_monotonic
+
+    def covers(self, field: str) -> bool:
+        return field in self.fields
+
+    def row(self, i: int) -> dict:
+        return {"art_articu": self.raw_codes[i], "art_descr1": self.raw_descr[i]}
+
+    def search(
+        self,
+        field: str,
+        value: str,
+        similar: bool = True,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        Misma semántica que la consulta a Informix: `similar` busca el valor
+        como substring (LIKE '%valor%'), si no por igualdad, y se saltean
+        `offset` resultados antes de devolver hasta `limit`. Con `after`
+        solo se consideran los códigos mayores (paginación por clave).
+        """
+        index = self.fields[field]
+        value = value.upper()
+
+        # Los artículos están ordenados por código: el cursor es una posición
+        first = bisect_right(self.fields["art_articu"].texts, after) if after is not None else 0
+
+        if similar:
+            ids = index.substring(value, offset + limit, first)[offset:]
+        else:
+            ids = index.exact.get(value, ())
+            start = bisect_left(ids, first) + offset
+            ids = ids[start:start + limit]
+
+        return [self.row(i) for i in ids]
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[dict]:
+        """
+        Primeros `limit` artículos, por orden de código, cuyo código empieza
+        con `prefix`: búsqueda binaria sobre los códigos ordenados.
+        """
+        prefix = normalize_text(prefix)
+        codes = self.fields["art_articu"].texts
+
+        results = []
+        i = bisect_left(codes, prefix)
+        while i < len(codes) and len(results) < limit and codes[i].startswith(prefix):
+            results.append(self.row(i))
+            i += 1
+        return results
+
+    def search_ranked(self, value: str, limit: int = 50, offset: int = 0) -> List[dict]:
+        """
+        Búsqueda aproximada sobre códigos y descripciones, tolerante a
+        errores de tipeo, acentos y separadores. Devuelve los artículos con
+        puntaje de al menos FUZZY_MIN_SCORE, del más al menos relevante.
+
+        Se puntúan a lo sumo FUZZY_MAX_CANDIDATES candidatos y se corta al
+        pasar FUZZY_TIME_BUDGET_MS.
+        """
+        query_tokens = _tokens(_fold(value))
+        if not query_tokens:
+            return []
+        query_key = "".join(query_tokens)
+
+        deadline = time.perf_counter() + FUZZY_TIME_BUDGET_MS / 1000
+        scored = []
+        memo = {}
+        for i in self.fuzzy.candidates(query_tokens).tolist():
+            score = self.fuzzy.score(i, query_key, query_tokens, memo)
+            if score >= FUZZY_MIN_SCORE:
+                scored.append((-score, i))
+            if time.perf_counter() > deadline:
+                logger.warning(f"search_ranked cortó por tiempo con {len(scored)} resultados | value='{value}'")
+                break
+
+        scored.sort()
+        return [
+            {**self.row(i), "score": round(-score, 4)}
+            for score, i in scored[offset:offset + limit]
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "loaded_at": self.loaded_at.isoformat(timespec="seconds"),
+            "articles": len(self),
+            "build_ms": self.build_ms,
+            "fields": {
+                name: {"ngrams": len(index.slots), "postings": index.posting_entries}
+                for name, index in self.fields.items()
+            },
+            "fuzzy": {"ngrams": len(self.fuzzy.slots), "postings": self.fuzzy.posting_entries},
+        }
+
+
+_index: Optional[ArticleIndex] = None
+_refresh_lock = threading.Lock()
+_last_refresh = {"at": None, "elapsed_ms": None, "error": None}
+
+
+def _fetch_article_rows(cursor) -> list:
+    cursor.execute(
+        """
+        SELECT art_articu, art_descr1
+        FROM manufact.art
+        """
+    )
+
+    rows = []
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        rows.extend(batch)
+    return rows
+
+
+def refresh_article_index() -> ArticleIndex:
+    """
+    Lee manufact.art completa, arma un índice nuevo y lo publica. Los
+    lectores siguen usando el anterior hasta que el nuevo está listo.
+    """
+    global _index
+
+    with _refresh_lock:
+        start = time.perf_counter()
+
+        with get_sim_db() as conn:
+            cursor = conn.cursor()
+            rows = _fetch_article_rows(cursor)
+
+        index = ArticleIndex(rows)
+        _index = index
+
+        elapsed = round((time.perf_counter() - start) * 1000, 2)
+        _last_refresh.update(at=datetime.now().isoformat(timespec="seconds"), elapsed_ms=elapsed, error=None)
+
+        logger.info(
+            f"Índice de artículos publicado: {len(index)} artículos, "
+            f"armado {index.build_ms} ms, total {elapsed} ms"
+        )
+        return index
+
+
+def get_article_index() -> Optional[ArticleIndex]:
+    """
+    Devuelve el índice si está caliente: cargado y refrescado hace menos de
+    ARTICLE_INDEX_MAX_AGE_FACTOR intervalos. Si no, None (se consulta Informix).
+    """
+    index = _index
+    if index is None:
+        return None
+    if index.age_seconds > ARTICLE_INDEX_REFRESH_MINUTES * 60 * ARTICLE_INDEX_MAX_AGE_FACTOR:
+        return None
+    return index
+
+
+def _refresh_job():
+    try:
+        refresh_article_index()
+    except Exception as e:
+        _last_refresh.update(error=str(e))
+        logger.exception("Error al refrescar el índice de artículos")
+
+
+def get_article_index_stats() -> Dict:
+    index = _index
+    return {
+        "enabled": ARTICLE_INDEX_ENABLED,
+        "refresh_minutes": ARTICLE_INDEX_REFRESH_MINUTES,
+        "warm": get_article_index() is not None,
+        "index": index.stats() if index is not None else None,
+        "last_refresh": dict(_last_refresh),
+    }
+
+
+def start_article_index_scheduler():
+    """
+    Scheduler que arma el índice al arrancar y lo refresca periódicamente.
+    Retorna None si el índice está deshabilitado.
+    """
+    if not ARTICLE_INDEX_ENABLED:
+        logger.info("Índice de artículos deshabilitado (SIM_ARTICLE_INDEX=false)")
+        return None
+
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        _refresh_job,
+        IntervalTrigger(minutes=ARTICLE_INDEX_REFRESH_MINUTES),
+        id="article_index_refresh_job",
+        next_run_time=datetime.now(),
+        max_instances=1,
+        coalesce=True,
+    )
+    scheduler.start()
+
+    logger.info("Scheduler del índice de artículos iniciado")
+    return scheduler
@@ -1,8 +1,40 @@
-from app.database import get_sim_db
+import os
+import time
+import base64
+import binascii
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.database import get_sim_db, SIM_POOL_MAX_SIZE
+from app.services.SIMReader.article_index import get_article_index
+from app.services.SIMReader.cache import LRUCache
+from app.services.SIMReader.informix import IN_CHUNK_SIZE, normalize_code, normalize_text, fetch_in_chunks
 from ___loggin___.logger import get_logger, LogArea, LogCategory
 
 logger = get_logger(LogArea.SIM, LogCategory.SIMREADER)
 
+# Cache de datos de artículos (descripción, letra de cambio) compartido por todo el proceso
+ARTICLE_CACHE_MAX_ENTRIES = int(os.getenv("SIM_ARTICLE_CACHE_MAX_ENTRIES", 100000))
+ARTICLE_CACHE_TTL_MINUTES = float(os.getenv("SIM_ARTICLE_CACHE_TTL_MINUTES", 30))
+# Los códigos inexistentes se recuerdan poco tiempo: un artículo nuevo puede aparecer en cualquier momento
+ARTICLE_CACHE_MISS_TTL_SECONDS = float(os.getenv("SIM_ARTICLE_CACHE_MISS_TTL_SECONDS", 60))
+
+# Máximo de hilos (cada uno con su conexión del pool de Informix)
+MAX_THREADS = 5
+
+# Conexiones que pueden ocupar a la vez todas las consultas masivas juntas:
+# siempre queda al menos una libre para el resto de los requests. Con un
+# pool de una sola conexión es 0 y las tandas van en secuencia (ver
+# stream_articles_data)
+BULK_MAX_CONNECTIONS = min(MAX_THREADS, SIM_POOL_MAX_SIZE - 1)
+
+# Máximo de códigos por consulta masiva
+BULK_MAX_CODES = 100000
+
+# Latencias recientes del autocompletado que se guardan para calcular percentiles
+AUTOCOMPLETE_LATENCY_WINDOW = 2048
+
 ORDERED_FIELDS = [
     "art_articu",
     "art_descr1",
@@ -14,33 +46,104 @@ ORDERED_FIELDS = [
     # "art_tipoar",
 ]
 
-def search_articles(field: str, value: str, similar: bool = True, limit: int = 50, offset: int = 0):
+_article_cache = LRUCache(
+    max_entries=ARTICLE_CACHE_MAX_ENTRIES,
+    ttl_seconds=ARTICLE_CACHE_TTL_MINUTES * 60,
+)
+
+# Códigos que no existen en manufact.art, con un TTL propio y corto
+_missing_cache = LRUCache(
+    max_entries=ARTICLE_CACHE_MAX_ENTRIES,
+    ttl_seconds=ARTICLE_CACHE_MISS_TTL_SECONDS,
+)
+
+_informix_stats = {"lookups": 0, "codes": 0, "queries": 0, "fetched": 0, "informix_ms": 0.0, "total_ms": 0.0}
+_informix_stats_lock = threading.Lock()
+
+_bulk_slots = threading.BoundedSemaphore(BULK_MAX_CONNECTIONS) if BULK_MAX_CONNECTIONS > 0 else None
+
+_autocomplete_latencies = deque(maxlen=AUTOCOMPLETE_LATENCY_WINDOW)
+_autocomplete_counts = {"index": 0, "informix": 0}
+_autocomplete_lock = threading.Lock()
+
+def encode_cursor(art_articu) -> str:
+    """
+    Cursor opaco de la paginación por clave: el último art_articu devuelto.
+    """
+    code = normalize_text(art_articu)
+    return base64.urlsafe_b64encode(code.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.b64decode(padded.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Cursor de paginación inválido.")
+
+
+def search_articles(
+    field: str,
+    value: str,
+    similar: bool = True,
+    limit: int = 50,
+    offset: int = 0,
+    after: str = None,
+):
+    """
+    Busca artículos por un campo permitido, ordenados por art_articu.
+
+    Con `after` (un art_articu, ver decode_cursor) se pagina por clave:
+    se devuelven los siguientes `limit` artículos con código mayor y
+    `offset` se ignora, así cada página cuesta lo mismo.
+    """
     debug = False
 
-    logger.info(f"search_articles iniciado con field='{field}', value='{value}', similar={similar}, limit={limit}, offset={offset}")
+    logger.info(
+        f"search_articles iniciado con field='{field}', value='{value}', similar={similar}, "
+        f"limit={limit}, offset={offset}, after={after!r}"
+    )
 
     if field not in ORDERED_FIELDS:
         logger.error(f"Campo inválido recibido en search_articles: {field}")
         raise ValueError(f"Campo '{field}' no está permitido para la búsqueda.")
 
+    if after is not None:
+        after = after.strip().upper()
+        offset = 0
+
+    index = get_article_index()
+    if index is not None and index.covers(field):
+        start = time.perf_counter()
+        results = index.search(field, value, similar=similar, limit=limit, offset=offset, after=after)
+        logger.info(
+            f"search_articles encontró {len(results)} resultados para value='{value}' en field='{field}' "
+            f"(índice en memoria, {(time.perf_counter() - start) * 1000:.2f} ms)"
+        )
+        return results
+
     param_value = value.upper()
 
     if similar:
-        query = f"""
-            SELECT SKIP {offset} FIRST {limit}
-                art_articu,
-                art_descr1
-            FROM manufact.art
-            WHERE UPPER(TRIM({field})) LIKE '%{param_value}%'
-        """
+        condition = f"UPPER(TRIM({field})) LIKE ?"
+        params = [f"%{param_value}%"]
     else:
-        query = f"""
-            SELECT SKIP {offset} FIRST {limit}
-                art_articu,
-                art_descr1
-            FROM manufact.art
-            WHERE UPPER(TRIM({field})) = '{param_value}'
-        """
+        condition = f"UPPER(TRIM({field})) = ?"
+        params = [param_value]
+
+    if after is not None:
+        condition += " AND art_articu > ?"
+        params.append(after)
+
+    # Orden por clave: SKIP estable y páginas siguientes con art_articu > cursor
+    query = f"""
+        SELECT SKIP {offset} FIRST {limit}
+            art_articu,
+            art_descr1
+        FROM manufact.art
+        WHERE {condition}
+        ORDER BY art_articu
+    """
 
     if debug:
         logger.debug("Query a ejecutar:")
@@ -49,7 +152,7 @@ def search_articles(field: str, value: str, similar: bool = True, limit: int = 5
 
     with get_sim_db() as conn:
         cursor = conn.cursor()
-        cursor.execute(query)
+        cursor.execute(query, params)
         columns = [col[0] for col in cursor.description]
         rows = cursor.fetchall()
         results = [dict(zip(columns, row)) for row in rows]
@@ -68,55 +171,331 @@ def search_articles(field: str, value: str, similar: bool = True, limit: int = 5
 
     return results
 
+def search_articles_ranked(value: str, limit: int = 50, offset: int = 0):
+    """
+    Búsqueda aproximada por código y descripción, ordenada por relevancia.
+    Solo se resuelve con el índice en memoria: sin índice caliente lanza
+    RuntimeError.
+    """
+    logger.info(f"search_articles_ranked iniciado con value='{value}', limit={limit}, offset={offset}")
+
+    index = get_article_index()
+    if index is None:
+        logger.warning("search_articles_ranked llamado sin índice de artículos disponible")
+        raise RuntimeError("El índice de artículos no está disponible.")
+
+    start = time.perf_counter()
+    results = index.search_ranked(value, limit=limit, offset=offset)
+
+    logger.info(
+        f"search_articles_ranked encontró {len(results)} resultados para value='{value}' "
+        f"({(time.perf_counter() - start) * 1000:.2f} ms)"
+    )
+    return results
+
+def _row_mapper(description):
+    """
+    Función fila -> dict con ORDERED_FIELDS, resuelta una sola vez por
+    resultado a partir de cursor.description.
+    """
+    columns = [col[0] for col in description]
+    positions = [(field, columns.index(field)) for field in ORDERED_FIELDS]
+    return lambda row: {field: row[pos] for field, pos in positions}
+
+
+def _fetch_articles(cursor, codes: list) -> dict:
+    """
+    Datos de manufact.art de `codes` (ya normalizados), indexados por código
+    normalizado, en consultas de a IN_CHUNK_SIZE códigos.
+    """
+    fields_str = ", ".join(ORDERED_FIELDS)
+    query = f"""
+        SELECT {fields_str}
+        FROM manufact.art
+        WHERE UPPER(TRIM(art_articu)) IN ({{placeholders}})
+    """
+    results = {}
+
+    logger.debug(f"Consultando {len(codes)} códigos en tandas de {IN_CHUNK_SIZE}")
+    logger.debug(query)
+
+    for n, rows in enumerate(fetch_in_chunks(cursor, query, codes), start=1):
+        to_dict = _row_mapper(cursor.description)
+
+        if rows:
+            logger.info(f"Chunk {n} devolvió {len(rows)} filas")
+            for r in rows[:10]:
+                logger.debug(str(to_dict(r)))
+
+        for row in rows:
+            result = to_dict(row)
+            results[normalize_text(result["art_articu"])] = result
+
+    return results
+
+
+def _cache_lookup(code: str):
+    """
+    (encontrado, valor): valor None con encontrado True es un código que
+    se sabe que no existe.
+    """
+    value, status = _article_cache.lookup(code)
+    if status == LRUCache.HIT:
+        return True, value
+    if _missing_cache.get(code):
+        return True, None
+    return False, None
+
+
+def _cache_store(code: str, value):
+    if value is None:
+        _missing_cache.set(code, True)
+    else:
+        _article_cache.set(code, value)
+
+
 def get_articles_data(art_codes: list[str]) -> dict:
+    """
+    Campos de ORDERED_FIELDS de los artículos indicados, indexados por
+    art_articu. Primero se busca en el cache de artículos y solo los
+    códigos que faltan se consultan en Informix.
+    """
     logger.info(f"get_articles_data iniciado con {len(art_codes)} códigos recibidos")
 
     if not art_codes:
         logger.warning("get_articles_data llamado con lista vacía")
         return {}
 
-    codes_upper = [code.upper().strip() for code in art_codes]
-    fields_str = ", ".join(ORDERED_FIELDS)
+    start = time.perf_counter()
+    codes_upper = list(dict.fromkeys(code.upper().strip() for code in art_codes))
 
     results = {}
-    chunk_size = 1000
+    missing = []
+    for code in codes_upper:
+        found, value = _cache_lookup(code)
+        if not found:
+            missing.append(code)
+        elif value is not None:
+            results[value["art_articu"]] = value
 
-    with get_sim_db() as conn:
-        cursor = conn.cursor()
-
-        for i in range(0, len(codes_upper), chunk_size):
-            chunk = codes_upper[i:i + chunk_size]
-            placeholders = ", ".join("?" for _ in chunk)
-            query = f"""
-                SELECT {fields_str}
-                FROM manufact.art
-                WHERE UPPER(TRIM(art_articu)) IN ({placeholders})
-            """
-
-            logger.debug(f"Ejecutando chunk {i // chunk_size + 1}: {len(chunk)} códigos")
-            logger.debug(query)
+    informix_ms = 0.0
+    if missing:
+        query_start = time.perf_counter()
 
-            cursor.execute(query, chunk)
-            columns = [col[0] for col in cursor.description]
-            rows = cursor.fetchall()
+        with get_sim_db() as conn:
+            cursor = conn.cursor()
+            fetched = _fetch_articles(cursor, missing)
 
-            if rows:
-                logger.info(f"Chunk {i // chunk_size + 1} devolvió {len(rows)} filas")
-                for r in rows[:10]:
-                    logger.debug(str(dict(zip(columns, r))))
+        informix_ms = (time.perf_counter() - query_start) * 1000
 
-            for row in rows:
-                result = {}
-                for field in ORDERED_FIELDS:
-                    value = row[columns.index(field)]
-                    result[field] = value
+        for code in missing:
+            value = fetched.get(code)
+            _cache_store(code, value)
+            if value is not None:
+                results[value["art_articu"]] = value
 
-                art_code = result["art_articu"]
-                results[art_code] = result
+    total_ms = (time.perf_counter() - start) * 1000
+    with _informix_stats_lock:
+        _informix_stats["lookups"] += 1
+        _informix_stats["codes"] += len(codes_upper)
+        _informix_stats["fetched"] += len(missing)
+        _informix_stats["queries"] += -(-len(missing) // IN_CHUNK_SIZE)
+        _informix_stats["informix_ms"] += informix_ms
+        _informix_stats["total_ms"] += total_ms
 
-    logger.info(f"get_articles_data finalizado. Total artículos procesados: {len(results)}")
+    logger.info(
+        f"get_articles_data finalizado. Total artículos procesados: {len(results)} | "
+        f"cache {len(codes_upper) - len(missing)}/{len(codes_upper)} | "
+        f"Informix {informix_ms:.2f} ms, total {total_ms:.2f} ms"
+    )
 
     for k in list(results.keys())[:10]:
         logger.debug(f"{k}: {results[k]}")
 
     return results
+
+
+def _escape_like(value: str) -> str:
+    # % y _ del código son literales, no comodines (la consulta usa ESCAPE '\')
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def autocomplete_articles(prefix: str, limit: int = 10) -> list:
+    """
+    Artículos cuyo código empieza con `prefix`, ordenados por código. Con
+    el índice caliente se resuelve en memoria; si no, con una consulta por
+    prefijo a Informix.
+    """
+    start = time.perf_counter()
+    prefix = prefix.strip().upper()
+
+    index = get_article_index()
+    if index is not None:
+        results = index.autocomplete(prefix, limit=limit)
+        source = "index"
+    else:
+        with get_sim_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT FIRST {int(limit)} art_articu, art_descr1
+                FROM manufact.art
+                WHERE art_articu LIKE ? ESCAPE '\\'
+                ORDER BY art_articu
+                """,
+                [_escape_like(prefix) + "%"]
+            )
+            columns = [col[0] for col in cursor.description]
+            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        source = "informix"
+
+    elapsed = (time.perf_counter() - start) * 1000
+    with _autocomplete_lock:
+        _autocomplete_latencies.append(elapsed)
+        _autocomplete_counts[source] += 1
+
+    logger.debug(
+        f"autocomplete_articles prefix='{prefix}' -> {len(results)} resultados "
+        f"({source}, {elapsed:.3f} ms)"
+    )
+    return results
+
+
+def get_autocomplete_stats() -> dict:
+    with _autocomplete_lock:
+        latencies = sorted(_autocomplete_latencies)
+        requests = dict(_autocomplete_counts)
+
+    def percentile(p):
+        return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)], 3) if latencies else None
+
+    return {
+        "window": len(latencies),
+        "requests": requests,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(latencies[-1], 3) if latencies else None,
+    }
+
+
+def normalize_article_codes(art_codes) -> list:
+    """
+    Códigos en mayúsculas y sin espacios, sin vacíos ni repetidos, en el
+    orden recibido.
+    """
+    return list(dict.fromkeys(
+        normalize_code(code) for code in art_codes if isinstance(code, str) and code.strip()
+    ))
+
+
+def _fetch_chunk(chunk: list) -> dict:
+    # El semáforo es compartido entre requests: varias consultas masivas no suman más conexiones
+    with _bulk_slots:
+        with get_sim_db() as conn:
+            cursor = conn.cursor()
+            return _fetch_articles(cursor, chunk)
+
+
+def stream_articles_data(art_codes):
+    """
+    Versión masiva de get_articles_data: genera {"codigo", "articulo"} por
+    cada código (articulo None si no existe en manufact.art).
+
+    Primero salen los que están en el cache; el resto se consulta en
+    tandas de IN_CHUNK_SIZE repartidas en hasta BULK_MAX_CONNECTIONS
+    conexiones (entre todas las consultas masivas en curso), y
+    cada tanda se emite en cuanto termina, sin esperar a las demás.
+
+    Si el pool tiene una sola conexión (BULK_MAX_CONNECTIONS = 0) las tandas
+    se consultan en secuencia en este mismo hilo, como cualquier request:
+    la conexión vuelve al pool entre una tanda y la siguiente.
+    """
+    codes = normalize_article_codes(art_codes)
+    start = time.perf_counter()
+
+    missing = []
+    for code in codes:
+        found, value = _cache_lookup(code)
+        if not found:
+            missing.append(code)
+        else:
+            yield {"codigo": code, "articulo": value}
+
+    cached = len(codes) - len(missing)
+    chunks = [missing[i:i + IN_CHUNK_SIZE] for i in range(0, len(missing), IN_CHUNK_SIZE)]
+
+    workers = min(BULK_MAX_CONNECTIONS, len(chunks))
+    logger.info(
+        f"stream_articles_data iniciado: {len(codes)} códigos, {cached} del cache, "
+        f"{len(chunks)} tandas en {workers or 'ninguno (en secuencia)'} hilos"
+    )
+
+    def emit(chunk, fetched):
+        for code in chunk:
+            value = fetched.get(code)
+            _cache_store(code, value)
+            yield {"codigo": code, "articulo": value}
+
+    informix_start = time.perf_counter()
+    if chunks and workers == 0:
+        for chunk in chunks:
+            with get_sim_db() as conn:
+                fetched = _fetch_articles(conn.cursor(), chunk)
+            yield from emit(chunk, fetched)
+    elif chunks:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {executor.submit(_fetch_chunk, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                yield from emit(futures[future], future.result())
+        finally:
+            # Si el cliente corta la conexión no se siguen lanzando tandas
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    now = time.perf_counter()
+    with _informix_stats_lock:
+        _informix_stats["lookups"] += 1
+        _informix_stats["codes"] += len(codes)
+        _informix_stats["fetched"] += len(missing)
+        _informix_stats["queries"] += len(chunks)
+        _informix_stats["informix_ms"] += (now - informix_start) * 1000 if chunks else 0.0
+        _informix_stats["total_ms"] += (now - start) * 1000
+
+    logger.info(
+        f"stream_articles_data finalizado: {len(codes)} códigos en {(now - start) * 1000:.2f} ms"
+    )
+
+
+def invalidate_article_cache(codes: list[str] = None) -> int:
+    """
+    Descarta del cache los códigos indicados, o todo si no se indica ninguno.
+    """
+    if codes is None:
+        entries = _article_cache.stats()["entries"] + _missing_cache.stats()["entries"]
+        _article_cache.clear()
+        _missing_cache.clear()
+        return entries
+
+    dropped = 0
+    for code in codes:
+        code = code.upper().strip()
+        dropped += _article_cache.invalidate(code) + _missing_cache.invalidate(code)
+    return dropped
+
+
+def get_article_cache_stats() -> dict:
+    with _informix_stats_lock:
+        informix = dict(_informix_stats)
+
+    lookups = informix["lookups"]
+    return {
+        **_article_cache.stats(),
+        "missing": _missing_cache.stats(),
+        "lookups": lookups,
+        "codes_requested": informix["codes"],
+        "codes_from_informix": informix["fetched"],
+        "informix_queries": informix["queries"],
+        "informix_ms": round(informix["informix_ms"], 2),
+        "avg_lookup_ms": round(informix["total_ms"] / lookups, 3) if lookups else 0.0,
+    }
@@ -0,0 +1,262 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, Optional
+
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+logger = get_logger(LogArea.SIM, LogCategory.SIMSTRUCTURE)
+
+
+class RootsMemo:
+    """
+    Memo compartido entre requests: código -> conjunto de padres de último
+    nivel. Cada entrada recuerda los ancestros que se recorrieron para
+    calcularla, así invalidar un código descarta todas las entradas que
+    pasaron por él.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._dependents = {}
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._invalidated = 0
+
+    def get(self, code: str) -> Optional[FrozenSet[str]]:
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            roots, ancestros, expires_at = entry
+            if expires_at < time.monotonic():
+                self._drop_locked(code)
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(code)
+            self._hits += 1
+            return roots
+
+    def get_with_deps(self, code: str):
+        """
+        Igual que `get` pero también devuelve los ancestros de la entrada,
+        para que quien la reutilice herede sus dependencias.
+        """
+        roots = self.get(code)
+        if roots is None:
+            return None, None
+        with self._lock:
+            entry = self._entries.get(code)
+            return (roots, entry[1]) if entry else (None, None)
+
+    def set(self, code: str, roots: Iterable[str], ancestros: Iterable[str]):
+        roots = frozenset(roots)
+        ancestros = frozenset(ancestros) | {code}
+
+        with self._lock:
+            if code in self._entries:
+                self._drop_locked(code)
+
+            self._entries[code] = (roots, ancestros, time.monotonic() + self.ttl_seconds)
+            for ancestro in ancestros:
+                self._dependents.setdefault(ancestro, set()).add(code)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop_locked(oldest)
+
+    def invalidate(self, codes: Iterable[str]) -> int:
+        """
+        Descarta toda entrada que dependa de alguno de los códigos indicados.
+        Retorna la cantidad de entradas descartadas.
+        """
+        dropped = 0
+        with self._lock:
+            for code in codes:
+                for dependent in list(self._dependents.get(code, ())):
+                    if dependent in self._entries:
+                        self._drop_locked(dependent)
+                        dropped += 1
+            self._invalidated += dropped
+
+        if dropped:
+            logger.debug(f"RootsMemo: {dropped} entradas invalidadas")
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._invalidated += len(self._entries)
+            self._entries.clear()
+            self._dependents.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / total, 4) if total else 0.0,
+                "invalidated": self._invalidated,
+            }
+
+    def _drop_locked(self, code: str):
+        roots, ancestros, _ = self._entries.pop(code)
+        for ancestro in ancestros:
+            dependents = self._dependents.get(ancestro)
+            if dependents is not None:
+                dependents.discard(code)
+                if not dependents:
+                    del self._dependents[ancestro]
+
+
+class LRUCache:
+    """
+    Cache acotado por cantidad de entradas y, opcionalmente, por memoria
+    estimada (`max_bytes` con la función `sizeof`), con expiración (TTL).
+
+    Cada entrada puede llevar etiquetas (por ejemplo los códigos que
+    contiene) para invalidar de una vez todas las entradas que las usan.
+    Seguro para usar desde varios hilos.
+    """
+
+    HIT = "hit"
+    MISS = "miss"
+    STALE = "stale"
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof=None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evictions = 0
+        self._invalidated = 0
+
+    def lookup(self, key):
+        """
+        Devuelve (valor, estado) con estado HIT, MISS o STALE (vencida).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None, self.MISS
+
+            value, expires_at, _, _ = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._drop_locked(key)
+                self._stale += 1
+                return None, self.STALE
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value, self.HIT
+
+    def get(self, key):
+        return self.lookup(key)[0]
+
+    def set(self, key, value, tags: Iterable = ()):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        size = self.sizeof(value) if self.sizeof else 0
+        tags = frozenset(tags)
+
+        with self._lock:
+            if key in self._entries:
+                self._drop_locked(key)
+
+            # Un valor más grande que todo el presupuesto no se guarda
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, expires_at, size, tags)
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._drop_locked(oldest)
+                self._evictions += 1
+
+    def invalidate(self, key) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._drop_locked(key)
+            self._invalidated += 1
+            return True
+
+    def invalidate_tags(self, tags: Iterable) -> int:
+        """
+        Descarta todas las entradas que tengan alguna de las etiquetas.
+        """
+        dropped = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    if key in self._entries:
+                        self._drop_locked(key)
+                        dropped += 1
+            self._invalidated += dropped
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._invalidated += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses + self._stale
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+                "hit_ratio": round(self._hits / total, 4) if total else 0.0,
+                "evictions": self._evictions,
+                "invalidated": self._invalidated,
+            }
+
+    def _drop_locked(self, key):
+        _, _, size, tags = self._entries.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
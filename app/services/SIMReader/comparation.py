@@ -0,0 +1,231 @@
+import time
+from datetime import date
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from app.services.SIMReader.estructura import get_all_hijos_batch, get_adyacencia
+from app.services.SIMReader.informix import normalize_code
+from app.services.SIMReader.merkle import EMPTY_HASH, subtree_hashes
+from app.services.SIMReader.snapshot import get_bom_snapshot
+
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+logger = get_logger(LogArea.SIM, LogCategory.SIMSTRUCTURE)
+
+
+class NodoEstado(str, Enum):
+    Normal = "Normal"
+    Nuevo = "Nuevo"
+    Eliminado = "Eliminado"
+
+
+def _membership(estructuras: List[list]) -> Dict[str, int]:
+    """
+    Para cada código devuelve un entero usado como bitset: el bit i está
+    encendido si el código aparece en la estructura i.
+    """
+    mascaras = {}
+    for i, estructura in enumerate(estructuras):
+        bit = 1 << i
+        stack = list(estructura)
+        while stack:
+            node = stack.pop()
+            codigo = node.codigo
+            mascaras[codigo] = mascaras.get(codigo, 0) | bit
+            stack.extend(node.hijos)
+    return mascaras
+
+
+def _mark(estructura: list, mascaras: Dict[str, int], bit: int, completa: int) -> list:
+    """
+    Copia el árbol agregando `estado` a cada nodo en una sola pasada:
+    Normal si el código está en todas las estructuras, Nuevo si está en
+    esta pero falta en alguna otra y Eliminado si no está en esta.
+    Los árboles originales vienen del cache y no se modifican.
+    """
+    resultado = []
+    stack = [(node, resultado) for node in reversed(estructura)]
+
+    while stack:
+        node, destino = stack.pop()
+        mascara = mascaras[node.codigo]
+
+        if mascara == completa:
+            estado = NodoEstado.Normal
+        elif mascara & bit:
+            estado = NodoEstado.Nuevo
+        else:
+            estado = NodoEstado.Eliminado
+
+        marcado = node.to_dict(recursive=False)
+        marcado["estado"] = estado
+        marcado["hijos"] = []
+        destino.append(marcado)
+
+        stack.extend((hijo, marcado["hijos"]) for hijo in reversed(node.hijos))
+
+    return resultado
+
+
+def compare_structures(codigos: List[str]) -> Dict[str, Any]:
+    """
+    Compara las estructuras de varios artículos.
+
+    Devuelve los códigos que no están en todas las estructuras, con las
+    estructuras en las que aparecen (`presentIn`) y en las que faltan
+    (`missingIn`), y cada árbol con el `estado` de sus nodos. La pertenencia
+    de cada código se guarda como bitset, así el costo es lineal en la
+    cantidad total de nodos.
+    """
+    start = time.perf_counter()
+
+    principales = list(dict.fromkeys(normalize_code(c) for c in codigos if c and c.strip()))
+    arboles = get_all_hijos_batch(principales)
+    estructuras = [arboles[codigo] for codigo in principales]
+
+    mascaras = _membership(estructuras)
+    completa = (1 << len(principales)) - 1
+
+    diferencias = []
+    for codigo, mascara in mascaras.items():
+        if mascara == completa:
+            continue
+        diferencias.append({
+            "codigo": codigo,
+            "presentIn": [p for i, p in enumerate(principales) if mascara >> i & 1],
+            "missingIn": [p for i, p in enumerate(principales) if not mascara >> i & 1],
+        })
+
+    estructuras_marcadas = [
+        _mark(estructura, mascaras, 1 << i, completa)
+        for i, estructura in enumerate(estructuras)
+    ]
+
+    logger.debug(
+        f"compare_structures finalizado: {len(principales)} estructuras, "
+        f"{len(mascaras)} códigos, {len(diferencias)} diferencias, "
+        f"{(time.perf_counter() - start) * 1000:.2f} ms"
+    )
+
+    return {
+        "compared": principales,
+        "differences": diferencias,
+        "structures": estructuras_marcadas,
+    }
+
+
+def _hashed_adjacency(code: str, snapshot, fecha: Optional[date]):
+    adyacencia = get_adyacencia(code, fecha)
+    if snapshot is not None and fecha is None:
+        return adyacencia, snapshot.subtree_hashes()
+    return adyacencia, subtree_hashes([code], lambda c: adyacencia.get(c, []))
+
+
+def _quantities(hijos: list) -> Dict[str, float]:
+    cantidades = {}
+    for hijo, cantid in hijos:
+        if hijo:
+            cantidades[hijo] = cantidades.get(hijo, 0.0) + float(cantid or 0)
+    return cantidades
+
+
+def diff_structures(
+    codigo_a: str,
+    codigo_b: str,
+    fecha_a: Optional[date] = None,
+    fecha_b: Optional[date] = None,
+) -> Dict[str, Any]:
+    """
+    Diferencias entre las estructuras de dos artículos, o del mismo
+    artículo en dos fechas (`fecha_a` / `fecha_b`, None es la vigente).
+
+    Se recorren las dos estructuras en paralelo comparando el hash de cada
+    subárbol: los subárboles idénticos se saltean sin mirar su contenido.
+    Cada cambio indica el padre (con su código en A), el hijo y las
+    cantidades en A y B; tipo es "agregado", "eliminado" o "cantidad".
+    """
+    start = time.perf_counter()
+    a, b = normalize_code(codigo_a), normalize_code(codigo_b)
+    snapshot = get_bom_snapshot()
+
+    if snapshot is not None and fecha_a is None and fecha_b is None:
+        hash_a = snapshot.subtree_hash(a) or EMPTY_HASH
+        hash_b = snapshot.subtree_hash(b) or EMPTY_HASH
+        if hash_a == hash_b:
+            return {
+                "codigo_a": a,
+                "codigo_b": b,
+                "fecha_a": None,
+                "fecha_b": None,
+                "hash_a": hash_a,
+                "hash_b": hash_b,
+                "iguales": True,
+                "cambios": [],
+                "subarboles_iguales": 1,
+            }
+
+    adyacencia_a, hashes_a = _hashed_adjacency(a, snapshot, fecha_a)
+    adyacencia_b, hashes_b = _hashed_adjacency(b, snapshot, fecha_b)
+
+    cambios = []
+    iguales = 0
+    visitados = set()
+    stack = [(a, b)]
+
+    while stack:
+        par = stack.pop()
+        if par in visitados:
+            continue
+        visitados.add(par)
+
+        padre_a, padre_b = par
+        if hashes_a.get(padre_a, EMPTY_HASH) == hashes_b.get(padre_b, EMPTY_HASH):
+            iguales += 1
+            continue
+
+        hijos_a = _quantities(adyacencia_a.get(padre_a, []))
+        hijos_b = _quantities(adyacencia_b.get(padre_b, []))
+
+        for hijo in sorted(hijos_a.keys() | hijos_b.keys()):
+            cantidad_a = hijos_a.get(hijo)
+            cantidad_b = hijos_b.get(hijo)
+
+            if cantidad_b is None:
+                tipo = "eliminado"
+            elif cantidad_a is None:
+                tipo = "agregado"
+            else:
+                if round(cantidad_a - cantidad_b, 6) != 0:
+                    tipo = "cantidad"
+                else:
+                    tipo = None
+                stack.append((hijo, hijo))
+
+            if tipo:
+                cambios.append({
+                    "padre": padre_a,
+                    "codigo": hijo,
+                    "tipo": tipo,
+                    "cantidad_a": cantidad_a,
+                    "cantidad_b": cantidad_b,
+                })
+
+    hash_a = hashes_a.get(a, EMPTY_HASH)
+    hash_b = hashes_b.get(b, EMPTY_HASH)
+
+    logger.debug(
+        f"diff_structures finalizado para {a} vs {b}: {len(cambios)} cambios, "
+        f"{iguales} subárboles iguales salteados, {(time.perf_counter() - start) * 1000:.2f} ms"
+    )
+
+    return {
+        "codigo_a": a,
+        "codigo_b": b,
+        "fecha_a": fecha_a,
+        "fecha_b": fecha_b,
+        "hash_a": hash_a,
+        "hash_b": hash_b,
+        "iguales": hash_a == hash_b,
+        "cambios": cambios,
+        "subarboles_iguales": iguales,
+    }
@@ -0,0 +1,20 @@
+import numpy as np
+
+
+def edge_positions(offsets: np.ndarray, nodes: np.ndarray):
+    """
+    Para un arreglo de nodos devuelve (rep, pos): `pos` son las posiciones
+    en los arreglos CSR de todas sus relaciones y `rep` el índice del nodo
+    dueño de cada una dentro de `nodes`.
+    """
+    starts = offsets[nodes]
+    counts = offsets[nodes + 1] - starts
+    total = int(counts.sum())
+
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    rep = np.repeat(np.arange(len(nodes)), counts)
+    pos = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+    return rep, pos
@@ -1,20 +1,101 @@
+import os
+import sys
 import time
-from typing import List, Dict, Any
+from datetime import date
+from hashlib import blake2b
+from typing import List, Dict, Any, Optional
 
 from app.database import get_sim_db
 from app.services.SIMReader.articulos import get_articles_data
+from app.services.SIMReader.snapshot import get_bom_snapshot, add_refresh_listener
+from app.services.SIMReader.cache import RootsMemo, LRUCache
+from app.services.SIMReader.informix import normalize_code, fetch_in_chunks
+from app.services.SIMReader.merkle import EMPTY_HASH, HASH_SIZE, subtree_hashes
+from app.services.SIMReader.historia import get_bom_history
+from app.services.SIMReader.nodes import StructureNode
 
 from ___loggin___.logger import get_logger, LogArea, LogCategory
 
 logger = get_logger(LogArea.SIM, LogCategory.SIMREADER)
 
-# Máximo de hilos
-MAX_THREADS = 5
+# Nodos enriquecidos por tanda al transmitir una estructura
+STREAM_BATCH_SIZE = 250
 
-def get_hijos(padre_code: str):
+# Memo de padres de último nivel compartido entre requests. Sin foto de
+# estructuras el TTL es lo único que lo invalida: igual que el cache de estructuras
+ROOTS_MEMO_TTL_MINUTES = float(os.getenv("SIM_ROOTS_MEMO_TTL_MINUTES", 15))
+ROOTS_MEMO_MAX_ENTRIES = int(os.getenv("SIM_ROOTS_MEMO_MAX_ENTRIES", 50000))
+
+_roots_memo = RootsMemo(
+    ttl_seconds=ROOTS_MEMO_TTL_MINUTES * 60,
+    max_entries=ROOTS_MEMO_MAX_ENTRIES,
+)
+
+# Cache de árboles de get_all_hijos por código raíz
+STRUCTURE_CACHE_MAX_ENTRIES = int(os.getenv("SIM_STRUCTURE_CACHE_MAX_ENTRIES", 256))
+STRUCTURE_CACHE_TTL_MINUTES = float(os.getenv("SIM_STRUCTURE_CACHE_TTL_MINUTES", 15))
+STRUCTURE_CACHE_MAX_MB = float(os.getenv("SIM_STRUCTURE_CACHE_MAX_MB", 256))
+
+# Memoria estimada por nodo de árbol (StructureNode, su lista de hijos y
+# las strings propias; códigos y cantidades están internados)
+TREE_NODE_BYTES = 400
+
+
+def _iter_tree(results):
+    stack = list(results)
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.hijos)
+
+
+def _estimate_tree_bytes(results) -> int:
+    return sum(1 for _ in _iter_tree(results)) * TREE_NODE_BYTES
+
+
+# Cada entrada es (árbol, versión): la versión se calcula una vez al armarlo
+_structure_cache = LRUCache(
+    max_entries=STRUCTURE_CACHE_MAX_ENTRIES,
+    ttl_seconds=STRUCTURE_CACHE_TTL_MINUTES * 60,
+    max_bytes=int(STRUCTURE_CACHE_MAX_MB * 1024 * 1024),
+    sizeof=lambda entry: _estimate_tree_bytes(entry[0]),
+)
+
+
+def get_roots_memo_stats() -> dict:
+    return _roots_memo.stats()
+
+
+def get_structure_cache_stats() -> dict:
+    return _structure_cache.stats()
+
+
+def get_hijos(padre_code: str, fecha: Optional[date] = None):
     padre_code_upper = padre_code.upper().strip()
 
-    logger.debug(f"get_hijos llamado para padre_code={padre_code_upper}")
+    logger.debug(f"get_hijos llamado para padre_code={padre_code_upper}, fecha={fecha}")
+
+    if fecha is not None:
+        results = [
+            {"est_hijo": hijo, "est_cantid": cantid, "est_numord": numord}
+            for hijo, cantid, numord in get_bom_history().children(padre_code_upper, fecha)
+        ]
+        logger.debug(
+            f"get_hijos devolvió {len(results)} hijos para {padre_code_upper} al {fecha}"
+        )
+        return results
+
+    snapshot = get_bom_snapshot()
+    if snapshot is not None:
+        results = [
+            {"est_hijo": hijo, "est_cantid": cantid, "est_numord": numord}
+            for hijo, cantid, numord in snapshot.children(padre_code_upper)
+        ]
+        logger.debug(
+            f"get_hijos devolvió {len(results)} hijos para {padre_code_upper} "
+            f"(foto v{snapshot.version})"
+        )
+        return results
 
     query = f"""
     SELECT est_hijo, est_cantid, est_numord
@@ -39,10 +120,28 @@ def get_hijos(padre_code: str):
 
     return results
 
-def get_padres(hijo_code: str):
+def get_padres(hijo_code: str, fecha: Optional[date] = None):
     hijo_code_upper = hijo_code.upper().strip()
 
-    logger.debug(f"get_padres llamado para hijo_code={hijo_code_upper}")
+    logger.debug(f"get_padres llamado para hijo_code={hijo_code_upper}, fecha={fecha}")
+
+    if fecha is not None:
+        results = [
+            {"est_padre": padre} for padre, _ in get_bom_history().parents(hijo_code_upper, fecha)
+        ]
+        logger.debug(
+            f"get_padres devolvió {len(results)} padres para {hijo_code_upper} al {fecha}"
+        )
+        return results
+
+    snapshot = get_bom_snapshot()
+    if snapshot is not None:
+        results = [{"est_padre": padre} for padre in snapshot.parents(hijo_code_upper)]
+        logger.debug(
+            f"get_padres devolvió {len(results)} padres para {hijo_code_upper} "
+            f"(foto v{snapshot.version})"
+        )
+        return results
 
     query = f"""
     SELECT est_padre
@@ -66,51 +165,107 @@ def get_padres(hijo_code: str):
 
     return results
 
-def get_last_level_padres(hijo_code: str):
-    hijo_code = hijo_code.strip()
+def _fetch_padres_por_nivel(hijo_code: str, cursor, memo_hits: dict):
+    """
+    Sube por la estructura en anchura trayendo los padres de todo un nivel
+    con una única consulta `est_hijo IN (...)`. Los códigos que ya están en
+    el memo no se expanden: se guardan en `memo_hits` como (raíces, ancestros).
 
-    logger.debug(f"get_last_level_padres iniciado para hijo_code={hijo_code}")
+    Retorna dict[hijo] -> lista de padres para los códigos consultados.
+    """
+    hijo_to_padres = {}
+    frontier = [hijo_code]
+    seen = {hijo_code}
+    level = 0
+
+    while frontier:
+        start_level = time.perf_counter()
+        to_fetch = []
+        for code in frontier:
+            if code != hijo_code:
+                roots, deps = _roots_memo.get_with_deps(code)
+                if roots is not None:
+                    memo_hits[code] = (roots, deps)
+                    continue
+            to_fetch.append(code)
+
+        for code in to_fetch:
+            hijo_to_padres[code] = []
+
+        chunks = fetch_in_chunks(
+            cursor,
+            """
+            SELECT TRIM(est_padre), TRIM(est_hijo)
+            FROM manufact.est
+            WHERE est_fechas IS NULL
+                AND est_hijo IN ({placeholders})
+            """,
+            to_fetch,
+        )
+        for rows in chunks:
+            for padre, hijo in rows:
+                padre = normalize_code(padre)
+                hijo = normalize_code(hijo)
+                if padre and hijo in hijo_to_padres:
+                    hijo_to_padres[hijo].append(padre)
+
+        next_frontier = []
+        for code in to_fetch:
+            for padre in hijo_to_padres[code]:
+                if padre not in seen:
+                    seen.add(padre)
+                    next_frontier.append(padre)
+
+        logger.debug(
+            f"Ancestros nivel {level}: {len(to_fetch)} consultados de {len(frontier)}, "
+            f"{(time.perf_counter() - start_level) * 1000:.2f} ms"
+        )
 
-    relaciones = []
-    stack_fetch = [hijo_code]
-    fetched = set()
+        frontier = next_frontier
+        level += 1
 
-    with get_sim_db() as conn:
-        cursor = conn.cursor()
+    return hijo_to_padres
 
-        while stack_fetch:
-            current = stack_fetch.pop()
 
-            if current in fetched:
-                continue
-            fetched.add(current)
+def get_last_level_padres(hijo_code: str):
+    """
+    Devuelve los padres de último nivel (sin padres por encima) de un código.
 
-            query = f"""
-                SELECT est_padre, est_hijo
-                FROM manufact.est
-                WHERE est_fechas IS NULL
-                    AND est_hijo = '{current}'
-            """
+    El resultado se guarda en un memo compartido entre requests; al subir
+    por la estructura, cualquier ancestro ya resuelto aporta sus raíces sin
+    volver a consultarse. Sin foto de estructuras, cada nivel de ancestros
+    se trae con una sola consulta IN.
 
-            logger.debug(f"Buscando padres de hijo={current}")
-            logger.debug(query)
+    Con la foto cargada el memo se invalida en cada refresco. Sin foto solo
+    vence por TTL, así que un cambio en manufact.est puede tardar hasta
+    SIM_ROOTS_MEMO_TTL_MINUTES (15 por defecto) en verse.
+    """
+    hijo_code = normalize_code(hijo_code)
 
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            relaciones.extend(rows)
+    logger.debug(f"get_last_level_padres iniciado para hijo_code={hijo_code}")
 
-            for padre, hijo in rows:
-                if padre:
-                    stack_fetch.append(padre.strip())
+    cached = _roots_memo.get(hijo_code)
+    if cached is not None:
+        logger.debug(f"get_last_level_padres resuelto desde memo para {hijo_code}")
+        return list(cached)
 
-    logger.debug(f"Total relaciones encontradas: {len(relaciones)}")
+    snapshot = get_bom_snapshot()
+    memo_hits = {}
 
-    hijo_to_padres = {}
-    for padre, hijo in relaciones:
-        hijo_to_padres.setdefault(hijo.strip(), []).append(padre.strip())
+    if snapshot is not None:
+        get_padres_of = snapshot.parents
+    else:
+        with get_sim_db() as conn:
+            cursor = conn.cursor()
+            hijo_to_padres = _fetch_padres_por_nivel(hijo_code, cursor, memo_hits)
+
+        logger.debug(f"Total códigos con padres consultados: {len(hijo_to_padres)}")
+
+        get_padres_of = hijo_to_padres.get
 
     stack = [hijo_code]
     visited = set()
+    ancestros = set()
     last_level_parents = set()
 
     while stack:
@@ -119,12 +274,26 @@ def get_last_level_padres(hijo_code: str):
             continue
         visited.add(codigo)
 
-        padres = hijo_to_padres.get(codigo)
+        if codigo != hijo_code:
+            if snapshot is not None:
+                roots, deps = _roots_memo.get_with_deps(codigo)
+            else:
+                roots, deps = memo_hits.get(codigo, (None, None))
+
+            if roots is not None:
+                last_level_parents.update(roots)
+                ancestros.update(deps)
+                continue
+
+        padres = get_padres_of(codigo)
         if not padres:
             last_level_parents.add(codigo)
         else:
             stack.extend(padres)
 
+    ancestros.update(visited)
+    _roots_memo.set(hijo_code, last_level_parents, ancestros)
+
     logger.debug(
         f"get_last_level_padres finalizado para {hijo_code}. "
         f"Niveles finales encontrados: {len(last_level_parents)}"
@@ -133,76 +302,286 @@ def get_last_level_padres(hijo_code: str):
     return list(last_level_parents)
 
 
-def get_all_hijos(padre_code: str) -> List[Dict[str, Any]]:
-    visited = set()
-    all_codes = set()
-    query_count = 0
-    start_global = time.time()
+def invalidate_last_level_padres(codes) -> int:
+    """
+    Invalida en el memo de padres de último nivel todas las entradas que
+    pasaron por alguno de los códigos indicados.
+    """
+    return _roots_memo.invalidate(normalize_code(code) for code in codes)
 
-    logger.debug(f"get_all_hijos iniciado para padre_code={padre_code}")
 
-    def normalize_code(val):
-        return val.strip().upper() if isinstance(val, str) else val
+def _on_snapshot_refresh(previous, snapshot, changed_parents):
+    if changed_parents is None or previous is None:
+        _roots_memo.clear()
+        _structure_cache.clear()
+        return
 
-    def fmt_qty(val):
-        if val is None:
-            return ""
-        try:
-            num = float(val)
-            return str(int(num)) if num.is_integer() else str(num)
-        except (ValueError, TypeError):
-            return str(val)
+    # Todo árbol cacheado que contiene un padre modificado queda desactualizado
+    _structure_cache.invalidate_tags(changed_parents)
 
-    def get_hijos_tree(code: str, level: int, cursor):
-        nonlocal query_count
+    # Cambiaron los hijos de estos padres: sus hijos (viejos y nuevos)
+    # tienen otro conjunto de padres.
+    afectados = set()
+    for padre in changed_parents:
+        afectados.update(hijo for hijo, _, _ in previous.children(padre))
+        afectados.update(hijo for hijo, _, _ in snapshot.children(padre))
 
-        code = normalize_code(code)
+    _roots_memo.invalidate(afectados)
 
-        if code in visited:
-            return None
 
-        visited.add(code)
-        all_codes.add(code)
+add_refresh_listener(_on_snapshot_refresh)
 
-        logger.debug(f"Procesando nodo codigo={code}, level={level}")
 
-        node = {
-            "codigo": code,
-            "cantidad": "",
-            "descripcion": "",
-            "letra_cambio": "",
-            "level": level,
-            "hijos": []
+def _fmt_qty(val):
+    if val is None:
+        return ""
+    try:
+        num = float(val)
+        return str(int(num)) if num.is_integer() else str(num)
+    except (ValueError, TypeError):
+        return str(val)
+
+
+def _articles_by_code(codes) -> Dict[str, dict]:
+    """
+    Datos de manufact.art de los códigos indicados, indexados por código normalizado.
+    """
+    articles_info = get_articles_data(list(codes))
+
+    if isinstance(articles_info, list):
+        return {
+            normalize_code(a.get("art_articu")): a
+            for a in articles_info
+            if a and a.get("art_articu")
         }
 
+    return {
+        normalize_code(k): v for k, v in articles_info.items()
+    }
+
+
+def _article_fields(info: dict):
+    """
+    (descripcion, letra_cambio) de un artículo de manufact.art.
+    """
+    return (
+        (info.get("art_descr1") or "").strip(),
+        (info.get("art_cambio") or "").strip(),
+    )
+
+
+def fetch_hijos_por_nivel(padre_code, cursor, max_depth: Optional[int] = None):
+    """
+    Recorre la estructura en anchura y trae los hijos de todo un nivel
+    con una única consulta `est_padre IN (...)` (particionada en bloques
+    de IN_CHUNK_SIZE códigos). Con `max_depth` solo se traen los hijos
+    de los niveles 0 a max_depth - 1.
+
+    `padre_code` puede ser un código o una lista de códigos; en ese caso
+    todas las estructuras se recorren juntas y cada código compartido se
+    consulta una sola vez.
+
+    Retorna:
+        - adyacencia: dict[padre] -> lista de (hijo, cantidad) ordenada por
+          est_numord, igual que en la foto.
+        - niveles: lista con nodos, queries y tiempo (ms) de cada nivel.
+    """
+    adyacencia = {}
+    niveles = []
+
+    frontier = [padre_code] if isinstance(padre_code, str) else list(dict.fromkeys(padre_code))
+    seen = set(frontier)
+    level = 0
+
+    while frontier and (max_depth is None or level < max_depth):
+        start_level = time.perf_counter()
+        level_queries = 0
+
+        for code in frontier:
+            adyacencia[code] = []
+
+        chunks = fetch_in_chunks(
+            cursor,
+            """
+            SELECT TRIM(est_padre), TRIM(est_hijo), est_cantid
+            FROM manufact.est
+            WHERE est_padre IN ({placeholders}) AND est_fechas IS NULL
+            ORDER BY est_padre, est_numord
+            """,
+            frontier,
+        )
+        for rows in chunks:
+            level_queries += 1
+
+            for padre, hijo, cantid in rows:
+                padre = normalize_code(padre)
+                hijo = normalize_code(hijo) if hijo else None
+                if padre in adyacencia:
+                    adyacencia[padre].append((hijo, cantid))
+
+        next_frontier = []
+        for code in frontier:
+            for hijo, _ in adyacencia[code]:
+                if hijo and hijo not in seen:
+                    seen.add(hijo)
+                    next_frontier.append(hijo)
+
+        elapsed = (time.perf_counter() - start_level) * 1000
+        niveles.append({
+            "level": level,
+            "nodos": len(frontier),
+            "queries": level_queries,
+            "ms": round(elapsed, 2),
+        })
+        logger.debug(
+            f"Nivel {level}: {len(frontier)} nodos, {level_queries} queries, {elapsed:.2f} ms"
+        )
+
+        frontier = next_frontier
+        level += 1
+
+    return adyacencia, niveles
+
+
+def _build_hijos_tree(code: str, level: int, get_rows, visited: set, all_codes: set, adyacencia: dict):
+    """
+    Arma el árbol de get_all_hijos en profundidad. Un código ya visitado
+    no vuelve a aparecer en el árbol. En `adyacencia` quedan los hijos
+    (hijo, cantidad) leídos de cada código, para calcular los hashes.
+    """
+    code = normalize_code(code)
+
+    if code in visited:
+        return None
+
+    visited.add(code)
+    all_codes.add(code)
+
+    logger.debug(f"Procesando nodo codigo={code}, level={level}")
+
+    node = StructureNode(codigo=sys.intern(code), level=level)
+
+    hijos_rows = get_rows(code)
+    hijos_adyacencia = adyacencia[code] = []
+
+    logger.debug(f"Encontrados {len(hijos_rows)} hijos para codigo={code}")
+
+    for row in hijos_rows:
+        hijo_code = normalize_code(row[0]) if row[0] else None
+        hijo_cant = _fmt_qty(row[1]) if len(row) > 1 else ""
+
+        if hijo_code:
+            hijos_adyacencia.append((hijo_code, row[1] if len(row) > 1 else 0))
+            child_node = _build_hijos_tree(hijo_code, level + 1, get_rows, visited, all_codes, adyacencia)
+            if child_node:
+                child_node.cantidad = sys.intern(hijo_cant)
+                node.hijos.append(child_node)
+
+    return node
+
+
+def _enrich_tree(node: StructureNode, articles_dict: dict, hashes: dict):
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        info = articles_dict.get(current.codigo)
+        if info:
+            current.descripcion, current.letra_cambio = _article_fields(info)
+        current.hash = hashes.get(current.codigo, EMPTY_HASH)
+        stack.extend(current.hijos)
+
+
+def _tree_hashes(roots, adyacencia: dict, snapshot) -> dict:
+    """
+    Hash de subárbol de cada código de los árboles: desde la foto si
+    está cargada o calculado sobre la adyacencia leída.
+    """
+    if snapshot is not None:
+        return snapshot.subtree_hashes()
+    if isinstance(roots, str):
+        roots = [roots]
+    return subtree_hashes(roots, lambda code: adyacencia.get(code, []))
+
+
+def get_all_hijos(
+    padre_code: str,
+    batched: bool = True,
+    fecha: Optional[date] = None,
+) -> List[StructureNode]:
+    """
+    Devuelve el árbol completo de hijos de un artículo, enriquecido con
+    descripción y letra de cambio. Los nodos son StructureNode (ver
+    nodes.py); se pueden leer como dict y serializar con nodes.dumps.
+
+    Con `fecha` se arma la estructura vigente en esa fecha desde el
+    historial en memoria (ver historia.py).
+
+    Si la foto de estructuras está cargada se resuelve en memoria. Si no,
+    con `batched=True` (por defecto) la estructura se trae nivel por nivel
+    con consultas IN; con `batched=False` se usa el recorrido recursivo
+    original de una consulta por nodo. En todos los modos el árbol
+    resultante y la eliminación de códigos repetidos son idénticos.
+    """
+    visited = set()
+    all_codes = set()
+    adyacencia = {}
+    query_count = 0
+    start_global = time.time()
+
+    logger.debug(f"get_all_hijos iniciado para padre_code={padre_code}, batched={batched}, fecha={fecha}")
+
+    def fetch_hijos_rows(code: str, cursor):
+        nonlocal query_count
+
         cursor.execute(
             """
             SELECT TRIM(est_hijo), est_cantid
             FROM manufact.est
             WHERE est_padre = ? AND est_fechas IS NULL
+            ORDER BY est_numord
             """,
             (code,)
         )
         query_count += 1
-        hijos_rows = cursor.fetchall()
+        return cursor.fetchall()
 
-        logger.debug(f"Encontrados {len(hijos_rows)} hijos para codigo={code}")
+    def get_hijos_tree(code: str, level: int, get_rows):
+        return _build_hijos_tree(code, level, get_rows, visited, all_codes, adyacencia)
 
-        for row in hijos_rows:
-            hijo_code = normalize_code(row[0]) if row[0] else None
-            hijo_cant = fmt_qty(row[1]) if len(row) > 1 else ""
+    snapshot = get_bom_snapshot() if fecha is None else None
 
-            if hijo_code:
-                child_node = get_hijos_tree(hijo_code, level + 1, cursor)
-                if child_node:
-                    child_node["cantidad"] = hijo_cant
-                    node["hijos"].append(child_node)
+    if fecha is not None:
+        history = get_bom_history()
+        tree = get_hijos_tree(
+            padre_code,
+            0,
+            lambda code: [(hijo, cantid) for hijo, cantid, _ in history.children(code, fecha)]
+        )
+    elif snapshot is not None:
+        logger.debug(f"get_all_hijos resuelto desde la foto v{snapshot.version}")
+        tree = get_hijos_tree(
+            padre_code,
+            0,
+            lambda code: [(hijo, cantid) for hijo, cantid, _ in snapshot.children(code)]
+        )
+    else:
+        with get_sim_db() as conn:
+            cursor = conn.cursor()
 
-        return node
+            if batched:
+                root_code = normalize_code(padre_code)
+                adyacencia, niveles = fetch_hijos_por_nivel(root_code, cursor)
+                query_count = sum(n["queries"] for n in niveles)
 
-    with get_sim_db() as conn:
-        cursor = conn.cursor()
-        tree = get_hijos_tree(padre_code, 0, cursor)
+                logger.info(
+                    f"Explosión por niveles de {root_code}: {len(niveles)} niveles, "
+                    f"{len(adyacencia)} nodos, {query_count} queries | "
+                    + ", ".join(f"N{n['level']}={n['ms']}ms" for n in niveles)
+                )
+
+                tree = get_hijos_tree(root_code, 0, lambda code: adyacencia.get(code, []))
+            else:
+                tree = get_hijos_tree(padre_code, 0, lambda code: fetch_hijos_rows(code, cursor))
 
     if not tree:
         logger.debug("get_all_hijos finalizado sin resultados")
@@ -213,34 +592,527 @@ def get_all_hijos(padre_code: str) -> List[Dict[str, Any]]:
         f"queries ejecutadas: {query_count}"
     )
 
-    articles_info = get_articles_data(list(all_codes))
+    articles_dict = _articles_by_code(all_codes)
 
-    if isinstance(articles_info, list):
-        articles_dict = {
-            normalize_code(a.get("art_articu")): a
-            for a in articles_info
-            if a and a.get("art_articu")
+    _enrich_tree(tree, articles_dict, _tree_hashes(tree.codigo, adyacencia, snapshot))
+
+    logger.debug(
+        f"get_all_hijos finalizado para padre_code={padre_code}. "
+        f"Tiempo total: {round(time.time() - start_global, 3)}s"
+    )
+
+    return [tree]
+
+
+
+def get_all_hijos_cached(padre_code: str, fecha: Optional[date] = None):
+    """
+    get_all_hijos con cache LRU/TTL por código raíz normalizado
+    (y fecha, si se pide la estructura a una fecha).
+
+    Retorna (árbol, versión, estado): la versión es la de get_tree_version,
+    guardada junto al árbol, y estado es "hit", "miss" o "stale" (había una
+    entrada pero estaba vencida).
+    """
+    code = normalize_code(padre_code)
+    key = code if fecha is None else (code, fecha.isoformat())
+
+    entry, status = _structure_cache.lookup(key)
+    if status == LRUCache.HIT:
+        logger.debug(f"get_all_hijos_cached: hit para {key}")
+        results, version = entry
+        return results, version, status
+
+    results = get_all_hijos(code, fecha=fecha)
+    version = get_tree_version(results)
+    _structure_cache.set(
+        key,
+        (results, version),
+        tags={node.codigo for node in _iter_tree(results)} | {code},
+    )
+
+    return results, version, status
+
+
+def get_all_hijos_batch(padre_codes: List[str]) -> Dict[str, List[StructureNode]]:
+    """
+    get_all_hijos para muchos códigos raíz a la vez.
+
+    Las raíces que no están en el cache se recorren juntas nivel por nivel
+    (cada subconjunto compartido se consulta una sola vez) y todos los
+    códigos se enriquecen en una única pasada de get_articles_data.
+    Cada árbol conserva las mismas reglas que get_all_hijos y queda
+    guardado en el cache de estructuras.
+    """
+    start = time.perf_counter()
+    roots = list(dict.fromkeys(normalize_code(c) for c in padre_codes if c and c.strip()))
+
+    results = {}
+    pending = []
+    for root in roots:
+        cached, status = _structure_cache.lookup(root)
+        if status == LRUCache.HIT:
+            results[root] = cached[0]
+        else:
+            pending.append(root)
+
+    if pending:
+        snapshot = get_bom_snapshot()
+        query_count = 0
+
+        if snapshot is not None:
+            def get_rows(code):
+                return [(hijo, cantid) for hijo, cantid, _ in snapshot.children(code)]
+        else:
+            with get_sim_db() as conn:
+                cursor = conn.cursor()
+                adyacencia, niveles = fetch_hijos_por_nivel(pending, cursor)
+            query_count = sum(n["queries"] for n in niveles)
+
+            def get_rows(code):
+                return adyacencia.get(code, [])
+
+        trees = {}
+        all_codes = set()
+        adyacencia_total = {}
+        for root in pending:
+            trees[root] = _build_hijos_tree(root, 0, get_rows, set(), all_codes, adyacencia_total)
+
+        articles_dict = _articles_by_code(all_codes)
+        hashes = _tree_hashes(pending, adyacencia_total, snapshot)
+
+        for root, tree in trees.items():
+            _enrich_tree(tree, articles_dict, hashes)
+            results[root] = [tree]
+            _structure_cache.set(
+                root,
+                (results[root], get_tree_version(results[root])),
+                tags={node.codigo for node in _iter_tree(results[root])} | {root},
+            )
+
+        logger.info(
+            f"get_all_hijos_batch: {len(pending)} raíces recorridas juntas, "
+            f"{len(all_codes)} códigos distintos, {query_count} queries de estructura"
+        )
+
+    logger.debug(
+        f"get_all_hijos_batch finalizado: {len(roots)} raíces "
+        f"({len(roots) - len(pending)} desde cache), {(time.perf_counter() - start) * 1000:.2f} ms"
+    )
+
+    return {root: results[root] for root in roots}
+
+
+def get_structure_hash(padre_code: str) -> str:
+    """
+    Hash del subárbol de un artículo: dos estructuras con el mismo hash
+    tienen los mismos hijos y cantidades en todos sus niveles.
+    Con la foto cargada se responde sin recorrer nada.
+    """
+    code = normalize_code(padre_code)
+    snapshot = get_bom_snapshot()
+
+    if snapshot is not None:
+        return snapshot.subtree_hash(code) or EMPTY_HASH
+
+    results, _, _ = get_all_hijos_cached(code)
+    return results[0].hash if results else EMPTY_HASH
+
+
+def get_tree_version(results: List[StructureNode]) -> str:
+    """
+    Versión del árbol tal como se sirve: el hash de estructura de las raíces
+    más código, descripción y letra de cambio de cada nodo. A diferencia del
+    hash de subárbol, cambia también cuando cambia solo el dato del artículo.
+    """
+    h = blake2b(digest_size=HASH_SIZE)
+    for node in results:
+        h.update(node.hash.encode())
+        h.update(b"\x1e")
+
+    articulos = {(node.codigo, node.descripcion, node.letra_cambio) for node in _iter_tree(results)}
+    for entry in sorted(articulos):
+        h.update("\x1f".join(entry).encode())
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+def invalidate_structure_cache(codes) -> int:
+    """
+    Descarta del cache todos los árboles que contienen alguno de los códigos.
+    """
+    return _structure_cache.invalidate_tags(normalize_code(code) for code in codes)
+
+
+def get_adyacencia(padre_code: str, fecha: Optional[date] = None) -> Dict[str, list]:
+    """
+    Adyacencia padre -> lista de (hijo, cantidad) de toda la estructura
+    de un artículo. Incluye una entrada (posiblemente vacía) por cada
+    código alcanzable. Se resuelve desde la foto si está cargada o
+    nivel por nivel desde Informix; con `fecha`, desde el historial.
+    """
+    root = normalize_code(padre_code)
+    snapshot = get_bom_snapshot()
+
+    if fecha is not None:
+        history = get_bom_history()
+        children = lambda code: history.children(code, fecha)
+    elif snapshot is not None:
+        children = snapshot.children
+    else:
+        with get_sim_db() as conn:
+            cursor = conn.cursor()
+            adyacencia, _ = fetch_hijos_por_nivel(root, cursor)
+        return adyacencia
+
+    adyacencia = {}
+    stack = [root]
+
+    while stack:
+        code = stack.pop()
+        if code in adyacencia:
+            continue
+
+        hijos = [(hijo, cantid) for hijo, cantid, _ in children(code)]
+        adyacencia[code] = hijos
+        stack.extend(hijo for hijo, _ in hijos if hijo not in adyacencia)
+
+    return adyacencia
+
+
+def get_structure_dag(padre_code: str) -> Dict[str, Any]:
+    """
+    Devuelve la estructura de un artículo como grafo compartido: cada
+    código distinto aparece una sola vez en `nodes` (con su descripción
+    y letra de cambio) y sus hijos lo referencian por código junto con
+    la cantidad de esa relación.
+
+    A diferencia de get_all_hijos no se pierde ninguna aparición de un
+    subconjunto repetido, y el tamaño crece con la cantidad de códigos
+    distintos y no con la cantidad de caminos. La vista expandida se
+    obtiene con iter_expanded_dag o en el cliente.
+    """
+    start = time.perf_counter()
+    root = normalize_code(padre_code)
+
+    adyacencia = get_adyacencia(root)
+    articles_dict = _articles_by_code(adyacencia.keys())
+
+    nodes = {}
+    total_relaciones = 0
+
+    for code, hijos in adyacencia.items():
+        descripcion, letra_cambio = _article_fields(articles_dict.get(code, {}))
+        nodes[code] = {
+            "codigo": code,
+            "descripcion": descripcion,
+            "letra_cambio": letra_cambio,
+            "hijos": [
+                {"codigo": hijo, "cantidad": _fmt_qty(cantid)}
+                for hijo, cantid in hijos
+                if hijo
+            ],
         }
+        total_relaciones += len(nodes[code]["hijos"])
+
+    logger.debug(
+        f"get_structure_dag finalizado para {root}: {len(nodes)} nodos, "
+        f"{total_relaciones} relaciones, {(time.perf_counter() - start) * 1000:.2f} ms"
+    )
+
+    return {
+        "root": root,
+        "total_nodos": len(nodes),
+        "total_relaciones": total_relaciones,
+        "nodes": nodes,
+    }
+
+
+def iter_expanded_dag(dag: Dict[str, Any]):
+    """
+    Expande de forma perezosa un grafo de get_structure_dag en pre-orden,
+    repitiendo cada subconjunto en todas sus apariciones. Una relación que
+    vuelve a un ancestro del camino actual (ciclo) se emite con
+    `ciclo=True` y no se expande.
+    """
+    nodes = dag["nodes"]
+    root = dag["root"]
+
+    def make(code, padre, level, cantidad, ciclo=False):
+        node = nodes.get(code, {})
+        return {
+            "codigo": code,
+            "padre": padre,
+            "level": level,
+            "cantidad": cantidad,
+            "descripcion": node.get("descripcion", ""),
+            "letra_cambio": node.get("letra_cambio", ""),
+            "ciclo": ciclo,
+        }
+
+    yield make(root, None, 0, "")
+
+    path = [root]
+    on_path = {root}
+    stack = [iter(nodes.get(root, {}).get("hijos", []))]
+
+    while stack:
+        hijo = next(stack[-1], None)
+        if hijo is None:
+            stack.pop()
+            on_path.discard(path.pop())
+            continue
+
+        code = hijo["codigo"]
+        level = len(path)
+
+        if code in on_path:
+            yield make(code, path[-1], level, hijo["cantidad"], ciclo=True)
+            continue
+
+        yield make(code, path[-1], level, hijo["cantidad"])
+
+        path.append(code)
+        on_path.add(code)
+        stack.append(iter(nodes.get(code, {}).get("hijos", [])))
+
+
+def _count_hijos(codes: list, cursor) -> Dict[str, int]:
+    """
+    Cantidad de hijos activos de cada código, en bloques IN.
+    """
+    counts = {}
+
+    chunks = fetch_in_chunks(
+        cursor,
+        """
+        SELECT est_padre, COUNT(*)
+        FROM manufact.est
+        WHERE est_padre IN ({placeholders}) AND est_fechas IS NULL
+        GROUP BY est_padre
+        """,
+        codes,
+    )
+    for rows in chunks:
+        for padre, count in rows:
+            counts[normalize_code(padre)] = int(count)
+
+    return counts
+
+
+def get_structure_levels(
+    padre_code: str,
+    max_depth: int = 2,
+    expand: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Devuelve la estructura de un artículo solo hasta `max_depth` niveles.
+
+    Cada nodo informa `has_children` y `child_count`, así el cliente puede
+    pedir más tarde los subárboles de los nodos que quiera abrir pasando
+    sus códigos en `expand` (en ese caso se devuelve un árbol por cada
+    código expandido, con `level` relativo a ese código). Solo se consultan
+    los niveles necesarios y solo se enriquecen los nodos devueltos.
+    """
+    start = time.perf_counter()
+    roots = [normalize_code(c) for c in (expand or [padre_code]) if c and c.strip()]
+
+    adyacencia = {}
+    counts = {}
+    snapshot = get_bom_snapshot()
+
+    if snapshot is not None:
+        def get_rows(code):
+            return [(hijo, cantid) for hijo, cantid, _ in snapshot.children(code)]
+
+        def get_count(code):
+            i = snapshot.index.get(code)
+            return int(snapshot.child_offsets[i + 1] - snapshot.child_offsets[i]) if i is not None else 0
     else:
-        articles_dict = {
-            normalize_code(k): v for k, v in articles_info.items()
+        with get_sim_db() as conn:
+            cursor = conn.cursor()
+
+            for root in roots:
+                root_ady, _ = fetch_hijos_por_nivel(root, cursor, max_depth=max_depth)
+                adyacencia.update(root_ady)
+
+            boundary = {
+                hijo
+                for hijos in adyacencia.values()
+                for hijo, _ in hijos
+                if hijo and hijo not in adyacencia
+            }
+            counts = _count_hijos(sorted(boundary), cursor) if boundary else {}
+
+        def get_rows(code):
+            return adyacencia.get(code)
+
+        def get_count(code):
+            rows = adyacencia.get(code)
+            return len(rows) if rows is not None else counts.get(code, 0)
+
+    returned_codes = set()
+
+    def build(code, level, cantidad, path):
+        returned_codes.add(code)
+        child_count = get_count(code)
+
+        node = {
+            "codigo": code,
+            "cantidad": cantidad,
+            "descripcion": "",
+            "letra_cambio": "",
+            "level": level,
+            "has_children": child_count > 0,
+            "child_count": child_count,
+            "hijos": []
         }
 
-    def enrich_tree(node):
+        if level < max_depth and child_count:
+            path.add(code)
+            for hijo, cantid in get_rows(code) or []:
+                if hijo and hijo not in path:
+                    node["hijos"].append(build(hijo, level + 1, _fmt_qty(cantid), path))
+            path.discard(code)
+
+        return node
+
+    trees = [build(root, 0, "", set()) for root in roots]
+
+    articles_dict = _articles_by_code(returned_codes)
+
+    def enrich(node):
         info = articles_dict.get(node["codigo"])
         if info:
-            node["descripcion"] = (info.get("art_descr1") or "").strip()
-            node["letra_cambio"] = (info.get("art_cambio") or "").strip()
-
+            node["descripcion"], node["letra_cambio"] = _article_fields(info)
         for hijo in node["hijos"]:
-            enrich_tree(hijo)
+            enrich(hijo)
 
-    enrich_tree(tree)
+    for tree in trees:
+        enrich(tree)
 
     logger.debug(
-        f"get_all_hijos finalizado para padre_code={padre_code}. "
-        f"Tiempo total: {round(time.time() - start_global, 3)}s"
+        f"get_structure_levels finalizado para {roots} (max_depth={max_depth}): "
+        f"{len(returned_codes)} códigos, {(time.perf_counter() - start) * 1000:.2f} ms"
     )
 
-    return [tree]
+    return trees
+
+
+def _children_resolver(root: str, fecha: Optional[date] = None):
+    """
+    Función code -> lista de (hijo, cantidad) que resuelve los hijos a
+    medida que se piden, para stream_all_hijos.
+
+    Desde la foto o el historial se consulta cada código en memoria. Sin
+    foto, la primera vez que se pide un código no leído se traen juntos los
+    hijos de todos los códigos ya descubiertos y pendientes (con
+    fetch_hijos_por_nivel, una conexión por tanda): el recorrido en
+    pre-orden va leyendo la estructura nivel por nivel a medida que baja.
+    """
+    if fecha is not None:
+        history = get_bom_history()
+        return lambda code: [(hijo, cantid) for hijo, cantid, _ in history.children(code, fecha)]
+
+    snapshot = get_bom_snapshot()
+    if snapshot is not None:
+        return lambda code: [(hijo, cantid) for hijo, cantid, _ in snapshot.children(code)]
+
+    adyacencia = {}
+    pending = {root: None}
+
+    def children(code):
+        if code not in adyacencia:
+            pending[code] = None
+            with get_sim_db() as conn:
+                cursor = conn.cursor()
+                fetched, _ = fetch_hijos_por_nivel(list(pending), cursor, max_depth=1)
+            pending.clear()
+            adyacencia.update(fetched)
+
+            for hijos in fetched.values():
+                for hijo, _ in hijos:
+                    if hijo and hijo not in adyacencia:
+                        pending[hijo] = None
+
+        return adyacencia[code]
+
+    return children
+
+
+def stream_all_hijos(padre_code: str, batch_size: int = STREAM_BATCH_SIZE, fecha: Optional[date] = None):
+    """
+    Variante en streaming de get_all_hijos: devuelve un generador que emite
+    los nodos en pre-orden, con los mismos códigos y la misma eliminación de
+    repetidos que get_all_hijos.
+
+    Los hijos se resuelven mientras se recorre (ver _children_resolver), no
+    antes: sin foto, cada tanda de lecturas trae el nivel siguiente de lo ya
+    descubierto. Los hijos de la raíz se leen antes de devolver el
+    generador, así un error de base sale como excepción de esta llamada.
+
+    Cada registro tiene codigo, padre, level, cantidad, descripcion y
+    letra_cambio. Los nodos se enriquecen en tandas de `batch_size`, así el
+    primer registro sale sin esperar a recorrer y enriquecer todo el árbol.
+    """
+    root = normalize_code(padre_code)
+    children = _children_resolver(root, fecha)
+    root_hijos = children(root)
+
+    logger.debug(f"stream_all_hijos iniciado para {root}: {len(root_hijos)} hijos directos")
+
+    def iter_nodes():
+        visited = {root}
+        yield root, None, 0, ""
+
+        stack = [(root, 0, iter(root_hijos))]
+        while stack:
+            padre, level, hijos = stack[-1]
+            row = next(hijos, None)
+            if row is None:
+                stack.pop()
+                continue
+
+            hijo, cantid = row
+            if not hijo or hijo in visited:
+                continue
+            visited.add(hijo)
+
+            yield hijo, padre, level + 1, _fmt_qty(cantid)
+            stack.append((hijo, level + 1, iter(children(hijo))))
+
+    def iter_records():
+        start = time.perf_counter()
+        total = 0
+        batch = []
+
+        def flush():
+            articles_dict = _articles_by_code({codigo for codigo, _, _, _ in batch})
+            for codigo, padre, level, cantidad in batch:
+                descripcion, letra_cambio = _article_fields(articles_dict.get(codigo, {}))
+                yield {
+                    "codigo": codigo,
+                    "padre": padre,
+                    "level": level,
+                    "cantidad": cantidad,
+                    "descripcion": descripcion,
+                    "letra_cambio": letra_cambio,
+                }
+
+        for node in iter_nodes():
+            batch.append(node)
+            if len(batch) >= batch_size:
+                yield from flush()
+                total += len(batch)
+                batch = []
+
+        if batch:
+            yield from flush()
+            total += len(batch)
+
+        logger.debug(
+            f"stream_all_hijos finalizado para {root}: {total} nodos, "
+            f"{(time.perf_counter() - start) * 1000:.2f} ms"
+        )
 
+    return iter_records()
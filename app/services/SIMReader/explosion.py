@@ -0,0 +1,190 @@
+import os
+import time
+from typing import Any, Dict
+
+import numpy as np
+
+from app.database import get_sim_db
+from app.services.SIMReader.cache import LRUCache
+from app.services.SIMReader.csr import edge_positions
+from app.services.SIMReader.informix import normalize_code
+from app.services.SIMReader.merkle import EMPTY_HASH
+from app.services.SIMReader.snapshot import BomSnapshot, get_bom_snapshot
+from app.services.SIMReader.estructura import fetch_hijos_por_nivel
+
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+logger = get_logger(LogArea.SIM, LogCategory.SIMSTRUCTURE)
+
+EXPLOSION_CACHE_SIZE = int(os.getenv("SIM_EXPLOSION_CACHE_SIZE", 512))
+EXPLOSION_CACHE_TTL_MINUTES = float(os.getenv("SIM_EXPLOSION_CACHE_TTL_MINUTES", 10))
+
+# Explosión por unidad, por (código raíz, hash del subárbol en la foto o None si es en vivo).
+# Con el hash como clave una entrada sigue sirviendo después de un refresco
+# de la foto si la estructura del código no cambió.
+_cache = LRUCache(
+    max_entries=EXPLOSION_CACHE_SIZE,
+    ttl_seconds=EXPLOSION_CACHE_TTL_MINUTES * 60,
+)
+
+
+def explode_unit(snapshot: BomSnapshot, root_id: int) -> Dict[str, np.ndarray]:
+    """
+    Explosión por unidad del código `root_id` sobre los arreglos de la foto.
+
+    Recorre el subgrafo en ondas topológicas (un nodo se procesa cuando ya
+    se procesaron todos sus padres) y en cada onda acumula de forma
+    vectorizada cantidad(hijo) += cantidad(padre) × cantidad(relación).
+    """
+    n = snapshot.node_count
+    offsets = snapshot.child_offsets
+    child_idx = snapshot.child_idx
+    child_qty = snapshot.child_qty
+
+    # Nodos alcanzables desde la raíz
+    reached = np.zeros(n, dtype=bool)
+    reached[root_id] = True
+    frontier = np.array([root_id], dtype=np.int64)
+
+    while frontier.size:
+        _, pos = edge_positions(offsets, frontier)
+        kids = np.unique(child_idx[pos])
+        kids = kids[~reached[kids]]
+        reached[kids] = True
+        frontier = kids.astype(np.int64)
+
+    sub_nodes = np.flatnonzero(reached)
+
+    # Grado de entrada dentro del subgrafo, sin contar relaciones hacia la raíz
+    _, pos = edge_positions(offsets, sub_nodes)
+    kids = child_idx[pos]
+    root_in_cycle = bool((kids == root_id).any())
+    indeg = np.bincount(kids[kids != root_id], minlength=n)
+
+    totals = np.zeros(n, dtype=np.float64)
+    totals[root_id] = 1.0
+    niveles = np.full(n, -1, dtype=np.int32)
+
+    wave = np.array([root_id], dtype=np.int64)
+    level = 0
+
+    while wave.size:
+        niveles[wave] = level
+
+        rep, pos = edge_positions(offsets, wave)
+        kids = child_idx[pos]
+        keep = kids != root_id
+        kids = kids[keep]
+
+        np.add.at(totals, kids, totals[wave[rep[keep]]] * child_qty[pos[keep]])
+        np.subtract.at(indeg, kids, 1)
+
+        candidates = np.unique(kids)
+        wave = candidates[indeg[candidates] == 0].astype(np.int64)
+        level += 1
+
+    processed = sub_nodes[niveles[sub_nodes] >= 0]
+    ciclos = sub_nodes[niveles[sub_nodes] < 0]
+    if root_in_cycle:
+        ciclos = np.append(ciclos, root_id)
+
+    ids = processed[processed != root_id]
+
+    return {
+        "ids": ids,
+        "totals": totals[ids],
+        "niveles": niveles[ids],
+        "hojas": (offsets[ids + 1] - offsets[ids]) == 0,
+        "ciclos": ciclos,
+    }
+
+
+def _snapshot_from_db(code: str) -> BomSnapshot:
+    """
+    Arma una foto temporal solo con la estructura de `code`,
+    traída nivel por nivel con consultas IN.
+    """
+    with get_sim_db() as conn:
+        cursor = conn.cursor()
+        adyacencia, _ = fetch_hijos_por_nivel(code, cursor)
+
+    rows = [
+        (padre, hijo, cantid, 0)
+        for padre, hijos in adyacencia.items()
+        for hijo, cantid in hijos
+        if hijo
+    ]
+
+    return BomSnapshot.from_rows(rows, version=0)
+
+
+def get_exploded_bom(codigo: str, cantidad: float = 1) -> Dict[str, Any]:
+    """
+    Devuelve la cantidad total de cada componente (hojas e intermedios)
+    necesaria para fabricar `cantidad` unidades de `codigo`, multiplicando
+    las cantidades nivel por nivel y sumando las apariciones repetidas.
+    """
+    code = normalize_code(codigo)
+    start = time.perf_counter()
+
+    snapshot = get_bom_snapshot()
+    key = (code, (snapshot.subtree_hash(code) or EMPTY_HASH) if snapshot is not None else None)
+
+    cached = _cache.get(key)
+    if cached is None:
+        if snapshot is None:
+            snapshot_local = _snapshot_from_db(code)
+        else:
+            snapshot_local = snapshot
+
+        root_id = snapshot_local.index.get(code)
+        if root_id is None:
+            unit = None
+        else:
+            unit = explode_unit(snapshot_local, root_id)
+            unit["codes"] = [snapshot_local.codes[i] for i in unit["ids"].tolist()]
+            unit["ciclos"] = sorted(snapshot_local.codes[i] for i in unit["ciclos"].tolist())
+
+        # Se guarda envuelto para poder cachear también "sin estructura" (None)
+        cached = (unit,)
+        _cache.set(key, cached)
+
+    unit = cached[0]
+
+    if unit is None:
+        results, ciclos = [], []
+    else:
+        totals = (unit["totals"] * float(cantidad)).round(6).tolist()
+        results = [
+            {
+                "codigo": c,
+                "cantidad": t,
+                "nivel": lvl,
+                "hoja": hoja,
+            }
+            for c, t, lvl, hoja in zip(
+                unit["codes"], totals, unit["niveles"].tolist(), unit["hojas"].tolist()
+            )
+        ]
+        results.sort(key=lambda r: (r["nivel"], r["codigo"]))
+        ciclos = unit["ciclos"]
+
+    if ciclos:
+        logger.warning(f"get_exploded_bom: ciclo detectado bajo {code}: {ciclos}")
+
+    logger.debug(
+        f"get_exploded_bom finalizado para {code} x {cantidad}: {len(results)} componentes, "
+        f"{(time.perf_counter() - start) * 1000:.2f} ms"
+    )
+
+    return {
+        "codigo": code,
+        "cantidad": cantidad,
+        "total": len(results),
+        "results": results,
+        "ciclos": ciclos,
+    }
+
+
+def get_explosion_cache_stats() -> dict:
+    return _cache.stats()
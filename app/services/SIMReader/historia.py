@@ -0,0 +1,216 @@
+import os
+import time
+import threading
+from bisect import bisect_right
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from dotenv import load_dotenv
+
+from app.database import get_sim_db
+from app.services.SIMReader.informix import normalize_code
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+load_dotenv()
+
+logger = get_logger(LogArea.SIM, LogCategory.SIMSTRUCTURE)
+
+HISTORY_ENABLED = os.getenv("SIM_BOM_HISTORY", "true").lower() == "true"
+# Cada cuánto se vuelve a leer el historial en segundo plano
+HISTORY_REFRESH_MINUTES = float(os.getenv("SIM_BOM_HISTORY_REFRESH_MINUTES", 60))
+
+# Filas leídas por viaje al traer manufact.est completa
+FETCH_BATCH_SIZE = 5000
+
+# Fin de vigencia de las filas activas (est_fechas IS NULL)
+VIGENTE = date.max.toordinal() + 1
+
+
+def _to_ordinal(fecha) -> int:
+    if fecha is None:
+        return VIGENTE
+    if isinstance(fecha, datetime):
+        return fecha.date().toordinal()
+    if isinstance(fecha, date):
+        return fecha.toordinal()
+    return date.fromisoformat(str(fecha).strip()[:10]).toordinal()
+
+
+class BomHistory:
+    """
+    Historial completo de manufact.est, incluidas las filas dadas de baja.
+
+    est_fechas es la fecha de baja de la fila: una relación está vigente en
+    la fecha D si est_fechas es NULL o posterior a D. Por cada padre (y por
+    cada hijo) las relaciones se guardan ordenadas por fecha de baja, así
+    las vigentes en D son el sufijo que empieza en bisect_right(bajas, D).
+    """
+
+    def __init__(self, rows):
+        hijos = {}
+        padres = {}
+        self.row_count = 0
+
+        for padre, hijo, cantid, numord, fechas in rows:
+            padre = normalize_code(padre)
+            hijo = normalize_code(hijo)
+            if not padre or not hijo:
+                continue
+
+            baja = _to_ordinal(fechas)
+            cantid = float(cantid) if cantid is not None else 0.0
+            numord = int(numord) if numord is not None else 0
+
+            hijos.setdefault(padre, []).append((baja, numord, hijo, cantid))
+            padres.setdefault(hijo, []).append((baja, padre, cantid))
+            self.row_count += 1
+
+        self._hijos = {code: self._index(entries) for code, entries in hijos.items()}
+        self._padres = {code: self._index(entries) for code, entries in padres.items()}
+        self.loaded_at = datetime.now()
+        self._loaded_monotonic = time.monotonic()
+
+    @staticmethod
+    def _index(entries: list) -> Tuple[List[int], list]:
+        entries.sort(key=lambda e: e[0])
+        return [e[0] for e in entries], [e[1:] for e in entries]
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self._loaded_monotonic
+
+    def children(self, code: str, fecha: date) -> List[Tuple[str, float, int]]:
+        """
+        Hijos de `code` vigentes en `fecha` como (hijo, cantidad, numord),
+        ordenados por est_numord.
+        """
+        bajas, entries = self._hijos.get(code, ((), ()))
+        vigentes = entries[bisect_right(bajas, fecha.toordinal()):]
+        return [(hijo, cantid, numord) for numord, hijo, cantid in sorted(vigentes, key=lambda e: e[0])]
+
+    def parents(self, code: str, fecha: date) -> List[Tuple[str, float]]:
+        """
+        Padres de `code` vigentes en `fecha` como (padre, cantidad).
+        """
+        bajas, entries = self._padres.get(code, ((), ()))
+        return list(entries[bisect_right(bajas, fecha.toordinal()):])
+
+    def stats(self) -> dict:
+        return {
+            "loaded_at": self.loaded_at.isoformat(timespec="seconds"),
+            "rows": self.row_count,
+            "parents": len(self._hijos),
+            "children": len(self._padres),
+        }
+
+
+_history: Optional[BomHistory] = None
+_load_lock = threading.Lock()
+_last_load_ms = None
+
+
+def _fetch_history_rows(cursor) -> list:
+    cursor.execute(
+        """
+        SELECT TRIM(est_padre), TRIM(est_hijo), est_cantid, est_numord, est_fechas
+        FROM manufact.est
+        """
+    )
+
+    rows = []
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        rows.extend(batch)
+    return rows
+
+
+def _load_locked() -> BomHistory:
+    global _history, _last_load_ms
+
+    start = time.perf_counter()
+
+    with get_sim_db() as conn:
+        cursor = conn.cursor()
+        history = BomHistory(_fetch_history_rows(cursor))
+
+    _history = history
+    _last_load_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    logger.info(
+        f"Historial de estructuras cargado: {history.row_count} relaciones, {_last_load_ms} ms"
+    )
+    return history
+
+
+def load_bom_history() -> BomHistory:
+    """
+    Lee manufact.est completa (con su historia) y la deja en memoria.
+    """
+    with _load_lock:
+        return _load_locked()
+
+
+def get_bom_history() -> BomHistory:
+    """
+    Devuelve el historial en memoria. Lo carga y refresca el scheduler
+    (ver start_bom_history_scheduler); mientras se recarga se sigue
+    sirviendo el anterior.
+
+    Solo si todavía no hay ninguno cargado (la primera carga está en curso
+    o el scheduler está deshabilitado) se espera esa carga.
+    """
+    history = _history
+    if history is not None:
+        return history
+
+    with _load_lock:
+        # Si la carga del scheduler estaba en curso, ya terminó
+        if _history is not None:
+            return _history
+        return _load_locked()
+
+
+def _refresh_job():
+    try:
+        load_bom_history()
+    except Exception:
+        logger.exception("Error al refrescar el historial de estructuras")
+
+
+def get_bom_history_stats() -> Dict:
+    history = _history
+    return {
+        "enabled": HISTORY_ENABLED,
+        "loaded": history is not None,
+        "refresh_minutes": HISTORY_REFRESH_MINUTES,
+        "last_load_ms": _last_load_ms,
+        **(history.stats() if history is not None else {}),
+    }
+
+
+def start_bom_history_scheduler():
+    """
+    Scheduler que carga el historial al arrancar y lo vuelve a leer cada
+    HISTORY_REFRESH_MINUTES. Retorna None si está deshabilitado.
+    """
+    if not HISTORY_ENABLED:
+        logger.info("Carga del historial de estructuras deshabilitada (SIM_BOM_HISTORY=false)")
+        return None
+
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        _refresh_job,
+        IntervalTrigger(minutes=HISTORY_REFRESH_MINUTES),
+        id="bom_history_refresh_job",
+        next_run_time=datetime.now(),
+        max_instances=1,
+        coalesce=True,
+    )
+    scheduler.start()
+
+    logger.info("Scheduler del historial de estructuras iniciado")
+    return scheduler
@@ -0,0 +1,32 @@
+from typing import Iterable, Iterator, List
+
+# Máximo de códigos por cláusula IN
+IN_CHUNK_SIZE = 1000
+
+
+def normalize_code(val):
+    """
+    Código en mayúsculas y sin espacios. Lo que no es string (None) queda igual.
+    """
+    return val.strip().upper() if isinstance(val, str) else val
+
+
+def normalize_text(val) -> str:
+    """
+    Igual que UPPER(TRIM(campo)) en la consulta a Informix; "" para NULL.
+    """
+    return str(val).strip().upper() if val is not None else ""
+
+
+def fetch_in_chunks(cursor, query: str, codes: Iterable) -> Iterator[List[tuple]]:
+    """
+    Ejecuta `query` en bloques de IN_CHUNK_SIZE códigos y genera las filas
+    de cada bloque. `query` lleva `{placeholders}` donde va la lista del IN;
+    mientras se procesa un bloque, `cursor.description` es la de su consulta.
+    """
+    codes = list(codes)
+    for i in range(0, len(codes), IN_CHUNK_SIZE):
+        chunk = codes[i:i + IN_CHUNK_SIZE]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(query.format(placeholders=placeholders), chunk)
+        yield cursor.fetchall()
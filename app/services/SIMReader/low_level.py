@@ -0,0 +1,343 @@
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.database import get_sim_db
+from app.services.SIMReader.snapshot import (
+    BomSnapshot,
+    get_bom_snapshot,
+    add_refresh_listener,
+    fetch_est_rows,
+)
+from app.services.SIMReader.csr import edge_positions
+from app.services.SIMReader.informix import normalize_code
+
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+logger = get_logger(LogArea.SIM, LogCategory.SIMSTRUCTURE)
+
+# Sin foto de estructuras, cada cuánto se vuelve a leer manufact.est para recalcular
+LEVELS_TTL_MINUTES = float(os.getenv("SIM_BOM_LEVELS_TTL_MINUTES", 60))
+
+
+def _csr(n: int, src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(src, kind="stable")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+    return offsets, dst[order]
+
+
+def _kahn_levels(n: int, offsets: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Nivel de cada nodo procesando el grafo en ondas topológicas: un nodo
+    entra en la onda siguiente a la de su último padre, así su nivel es el
+    camino más largo desde una raíz. Los nodos que quedan en -1 están en un
+    ciclo o debajo de uno.
+    """
+    indeg = np.bincount(targets, minlength=n)
+    levels = np.full(n, -1, dtype=np.int32)
+
+    wave = np.flatnonzero(indeg == 0)
+    level = 0
+
+    while wave.size:
+        levels[wave] = level
+        _, pos = edge_positions(offsets, wave)
+        kids = targets[pos]
+        np.subtract.at(indeg, kids, 1)
+        candidates = np.unique(kids)
+        wave = candidates[indeg[candidates] == 0]
+        level += 1
+
+    return levels
+
+
+def _strong_components(nodes: List[int], offsets: list, targets: list, inside: set) -> List[List[int]]:
+    """
+    Componentes fuertemente conexas (Tarjan, iterativo) del subgrafo formado
+    por `nodes`. Solo se siguen relaciones hacia nodos de `inside`.
+    """
+    index = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+
+    for start in nodes:
+        if start in index:
+            continue
+
+        index[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, offsets[start])]
+
+        while work:
+            v, pos = work[-1]
+
+            if pos < offsets[v + 1]:
+                work[-1] = (v, pos + 1)
+                w = targets[pos]
+                if w not in inside:
+                    continue
+                if w not in index:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, offsets[w]))
+                elif w in on_stack and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+
+            work.pop()
+            if work:
+                u = work[-1][0]
+                if low[v] < low[u]:
+                    low[u] = low[v]
+
+            if low[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+
+    return components
+
+
+class BomLevels:
+    """
+    Resultado del análisis del grafo de estructuras de una foto:
+
+        - low_level_code[i]: nivel más profundo en el que aparece el código i
+          en cualquier producto (0 = no es hijo de nadie). Los códigos de un
+          mismo ciclo comparten nivel.
+        - level_nodes[level_offsets[k]:level_offsets[k + 1]]: códigos del nivel k,
+          para procesar de a un nivel en tiempo lineal.
+        - cycles: componentes fuertemente conexas con más de un código o
+          con una relación de un código consigo mismo.
+    """
+
+    def __init__(self, snapshot: BomSnapshot, low_level_code: np.ndarray, cycles: List[List[int]]):
+        self.snapshot = snapshot
+        self.low_level_code = low_level_code
+        self.cycles = cycles
+        self.computed_at = datetime.now()
+        self._computed_monotonic = time.monotonic()
+
+        self.level_nodes = np.argsort(low_level_code, kind="stable").astype(np.int32)
+        self.max_level = int(low_level_code.max()) if low_level_code.size else -1
+        self.level_offsets = np.zeros(self.max_level + 2, dtype=np.int64)
+        np.cumsum(np.bincount(low_level_code, minlength=self.max_level + 1), out=self.level_offsets[1:])
+
+        self.in_cycle = np.zeros(snapshot.node_count, dtype=bool)
+        for component in cycles:
+            self.in_cycle[component] = True
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self._computed_monotonic
+
+    def low_level(self, code: str) -> Optional[int]:
+        i = self.snapshot.index.get(code)
+        return None if i is None else int(self.low_level_code[i])
+
+    def iter_levels(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        (nivel, ids de los códigos de ese nivel) de arriba hacia abajo.
+        """
+        for level in range(self.max_level + 1):
+            yield level, self.level_nodes[self.level_offsets[level]:self.level_offsets[level + 1]]
+
+    def cycle_report(self) -> List[dict]:
+        snapshot = self.snapshot
+        codes = snapshot.codes
+        report = []
+
+        for component in self.cycles:
+            miembros = set(component)
+            relaciones = []
+            for i in sorted(component, key=lambda j: codes[j]):
+                start, end = snapshot.child_offsets[i], snapshot.child_offsets[i + 1]
+                for j, q in zip(snapshot.child_idx[start:end].tolist(), snapshot.child_qty[start:end].tolist()):
+                    if j in miembros:
+                        relaciones.append({"padre": codes[i], "hijo": codes[j], "cantidad": q})
+
+            report.append({
+                "codigos": sorted(codes[i] for i in component),
+                "nivel": int(self.low_level_code[component[0]]),
+                "relaciones": relaciones,
+            })
+
+        report.sort(key=lambda c: c["codigos"][0])
+        return report
+
+    def stats(self) -> dict:
+        return {
+            "snapshot_version": self.snapshot.version,
+            "computed_at": self.computed_at.isoformat(timespec="seconds"),
+            "codes": self.snapshot.node_count,
+            "levels": self.max_level + 1,
+            "cycles": len(self.cycles),
+            "codes_in_cycles": int(self.in_cycle.sum()),
+        }
+
+
+def compute_low_level_codes(
+    n: int,
+    offsets: np.ndarray,
+    targets: np.ndarray,
+) -> Tuple[np.ndarray, List[List[int]]]:
+    """
+    Low-level code de cada uno de los `n` nodos de un grafo en formato CSR
+    (hijos de i: targets[offsets[i]:offsets[i + 1]]) y sus ciclos.
+
+    Primero se recorre el grafo completo en ondas topológicas (vectorizado).
+    Si todo se procesó no hay ciclos y las ondas ya son los niveles. Si no,
+    Tarjan se corre solo sobre los nodos que quedaron sin procesar, cada
+    componente se colapsa en un nodo y se vuelven a calcular las ondas.
+    """
+    targets = targets.astype(np.int64)
+
+    levels = _kahn_levels(n, offsets, targets)
+    pendientes = np.flatnonzero(levels < 0)
+
+    cycles = []
+    if pendientes.size:
+        offsets_list = offsets.tolist()
+        targets_list = targets.tolist()
+        pendientes_list = pendientes.tolist()
+
+        components = _strong_components(pendientes_list, offsets_list, targets_list, set(pendientes_list))
+
+        comp = np.arange(n, dtype=np.int64)
+        for component in components:
+            if len(component) > 1:
+                comp[component] = component[0]
+                cycles.append(component)
+            else:
+                i = component[0]
+                if i in targets_list[offsets_list[i]:offsets_list[i + 1]]:
+                    cycles.append(component)
+
+        # Grafo condensado: cada ciclo es un solo nodo y se descartan sus relaciones internas
+        src = comp[np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))]
+        dst = comp[targets]
+        keep = src != dst
+        c_offsets, c_targets = _csr(n, src[keep], dst[keep])
+
+        levels = _kahn_levels(n, c_offsets, c_targets)[comp]
+
+    return levels, cycles
+
+
+def compute_bom_levels(snapshot: BomSnapshot) -> BomLevels:
+    """
+    Calcula componentes fuertemente conexas, ciclos y low-level code de
+    todos los códigos de la foto.
+    """
+    start = time.perf_counter()
+    n = snapshot.node_count
+
+    levels, cycles = compute_low_level_codes(n, snapshot.child_offsets, snapshot.child_idx)
+    result = BomLevels(snapshot, levels, cycles)
+
+    logger.info(
+        f"Low-level codes de la foto v{snapshot.version}: {n} códigos, "
+        f"{result.max_level + 1} niveles, {len(cycles)} ciclos, "
+        f"{(time.perf_counter() - start) * 1000:.2f} ms"
+    )
+    if cycles:
+        logger.warning(
+            f"Ciclos en manufact.est: "
+            + "; ".join(" -> ".join(sorted(snapshot.codes[i] for i in c)) for c in cycles[:20])
+        )
+
+    return result
+
+
+_levels: Optional[BomLevels] = None
+_levels_lock = threading.Lock()
+
+
+def _snapshot_from_db() -> BomSnapshot:
+    with get_sim_db() as conn:
+        cursor = conn.cursor()
+        return BomSnapshot.from_rows(fetch_est_rows(cursor), version=0)
+
+
+def get_bom_levels() -> BomLevels:
+    """
+    Devuelve el análisis vigente. Con la foto cargada se recalcula en cada
+    refresco de la foto; sin foto se lee manufact.est completa y el
+    resultado se reutiliza durante LEVELS_TTL_MINUTES.
+    """
+    global _levels
+
+    snapshot = get_bom_snapshot()
+    levels = _levels
+
+    if levels is not None:
+        if snapshot is not None and levels.snapshot is snapshot:
+            return levels
+        if snapshot is None and levels.snapshot.version == 0 and levels.age_seconds < LEVELS_TTL_MINUTES * 60:
+            return levels
+
+    with _levels_lock:
+        if _levels is not levels:
+            return _levels
+        _levels = compute_bom_levels(snapshot if snapshot is not None else _snapshot_from_db())
+        return _levels
+
+
+def _on_snapshot_refresh(previous, snapshot, changed_parents):
+    global _levels
+
+    # Se recalcula en el hilo del refresco para que los requests no paguen ese costo
+    with _levels_lock:
+        _levels = compute_bom_levels(snapshot)
+
+
+add_refresh_listener(_on_snapshot_refresh)
+
+
+def get_low_level_code(codigo: str) -> Dict:
+    code = normalize_code(codigo)
+    levels = get_bom_levels()
+    i = levels.snapshot.index.get(code)
+
+    return {
+        "codigo": code,
+        "low_level_code": None if i is None else int(levels.low_level_code[i]),
+        "en_ciclo": False if i is None else bool(levels.in_cycle[i]),
+    }
+
+
+def get_cycle_report() -> Dict:
+    levels = get_bom_levels()
+    ciclos = levels.cycle_report()
+
+    return {
+        "total": len(ciclos),
+        "ciclos": ciclos,
+        **levels.stats(),
+    }
+
+
+def get_bom_levels_stats() -> Dict:
+    levels = _levels
+    return {
+        "computed": levels is not None,
+        "ttl_minutes": LEVELS_TTL_MINUTES,
+        **(levels.stats() if levels is not None else {}),
+    }
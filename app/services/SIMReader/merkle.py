@@ -0,0 +1,103 @@
+from hashlib import blake2b
+from typing import Callable, Dict, Iterable, Optional
+
+# Largo en bytes del hash de cada subárbol (32 caracteres hexadecimales)
+HASH_SIZE = 16
+
+# Lo que aporta un hijo que cierra un ciclo en lugar de su propio hash
+CYCLE_MARK = "ciclo"
+
+
+def node_hash(children: Iterable) -> str:
+    """
+    Hash de un nodo a partir de sus hijos directos (codigo, cantidad, hash).
+    No incluye el código del propio nodo: dos artículos con los mismos hijos
+    y cantidades tienen el mismo hash. El orden de los hijos no importa.
+    """
+    h = blake2b(digest_size=HASH_SIZE)
+    for entry in sorted(
+        f"{codigo}\x1f{float(cantidad or 0):.6f}\x1f{hijo_hash}"
+        for codigo, cantidad, hijo_hash in children
+    ):
+        h.update(entry.encode())
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+# Hash de un código sin hijos
+EMPTY_HASH = node_hash(())
+
+
+def subtree_hashes(
+    roots: Iterable[str],
+    get_children: Callable,
+    known: Optional[Dict[str, str]] = None,
+) -> Dict[str, str]:
+    """
+    Calcula de abajo hacia arriba el hash de cada código alcanzable desde
+    `roots`. `get_children(codigo)` devuelve los hijos directos como
+    (hijo, cantidad). Cada código se procesa una sola vez y los de `known`
+    se toman como ya calculados.
+
+    Los códigos de un mismo ciclo (componente fuertemente conexa, con el
+    algoritmo de Tarjan) se cierran juntos: cada hijo del mismo ciclo aporta
+    CYCLE_MARK en lugar de su hash. Así el resultado no depende del orden
+    del recorrido ni de por qué código se entra al ciclo, y la foto y la
+    lectura en vivo dan los mismos hashes.
+    """
+    hashes = dict(known) if known else {}
+    children = {}
+    index = {}
+    lowlink = {}
+    en_curso = []
+    en_curso_set = set()
+
+    def visit(code):
+        index[code] = lowlink[code] = len(index)
+        en_curso.append(code)
+        en_curso_set.add(code)
+        hijos = children[code] = [h for h in get_children(code) if h[0]]
+        return code, iter(hijos)
+
+    for root in roots:
+        if root in hashes or root in index:
+            continue
+
+        stack = [visit(root)]
+
+        while stack:
+            code, pendientes = stack[-1]
+
+            for hijo, _ in pendientes:
+                if hijo in hashes:
+                    continue
+                if hijo not in index:
+                    stack.append(visit(hijo))
+                    break
+                if hijo in en_curso_set:
+                    lowlink[code] = min(lowlink[code], index[hijo])
+            else:
+                stack.pop()
+                if stack:
+                    padre = stack[-1][0]
+                    lowlink[padre] = min(lowlink[padre], lowlink[code])
+
+                if lowlink[code] != index[code]:
+                    continue
+
+                # `code` cierra una componente: todos sus hijos de afuera ya tienen hash
+                componente = set()
+                while True:
+                    miembro = en_curso.pop()
+                    en_curso_set.discard(miembro)
+                    componente.add(miembro)
+                    if miembro == code:
+                        break
+
+                for miembro in componente:
+                    hashes[miembro] = node_hash(
+                        (hijo, cantid, CYCLE_MARK if hijo in componente else hashes[hijo])
+                        for hijo, cantid in children.pop(miembro)
+                    )
+
+    return hashes
@@ -0,0 +1,78 @@
+import json
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from typing import Any, List
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - sin orjson se usa json de la librería estándar
+    orjson = None
+
+
+@dataclass(slots=True)
+class StructureNode:
+    """
+    Nodo de los árboles de get_all_hijos.
+
+    Con __slots__ cada nodo ocupa bastante menos que un dict de siete claves,
+    y orjson lo serializa directo sin pasar por jsonable_encoder. Para el
+    código que lo lee como dict se mantienen `node["clave"]` y `node.get`.
+    """
+
+    codigo: str
+    cantidad: str = ""
+    descripcion: str = ""
+    letra_cambio: str = ""
+    level: int = 0
+    hijos: List["StructureNode"] = field(default_factory=list)
+    hash: str = ""
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def to_dict(self, recursive: bool = True) -> dict:
+        """
+        El nodo como dict con las mismas claves que antes. Con
+        `recursive=False` los hijos quedan como StructureNode.
+        """
+        return {
+            "codigo": self.codigo,
+            "cantidad": self.cantidad,
+            "descripcion": self.descripcion,
+            "letra_cambio": self.letra_cambio,
+            "level": self.level,
+            "hijos": [h.to_dict() for h in self.hijos] if recursive else self.hijos,
+            "hash": self.hash,
+        }
+
+
+def _default(obj):
+    if isinstance(obj, StructureNode):
+        return obj.to_dict(recursive=False)
+    # Igual que jsonable_encoder: Decimal como número y fechas en ISO 8601
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def dumps(obj) -> bytes:
+    """
+    Serializa a JSON (bytes UTF-8) resultados que pueden contener
+    StructureNode, con orjson si está instalado. orjson no acepta más de
+    254 niveles de anidamiento; esos árboles se serializan con json.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default)
+        except TypeError:
+            pass
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,211 @@
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.services.SIMReader.informix import normalize_code
+from app.services.SIMReader.low_level import BomLevels, get_bom_levels
+
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+logger = get_logger(LogArea.SIM, LogCategory.SIMSTRUCTURE)
+
+
+def _bits(bitmap: int) -> Iterable[int]:
+    while bitmap:
+        low = bitmap & -bitmap
+        yield low.bit_length() - 1
+        bitmap ^= low
+
+
+class SharedComponents:
+    """
+    Para cada código de la foto, el conjunto de productos de primer nivel
+    (códigos que no son hijos de nadie y tienen hijos) que lo contienen en
+    cualquier nivel, como bitmap: el bit k corresponde a products[k].
+
+    Los bitmaps se arman en una sola pasada de arriba hacia abajo siguiendo
+    los low-level codes: cuando se procesa un código ya están listos los de
+    todos sus padres, así que alcanza con hacer el OR de ellos. Los códigos
+    de un mismo ciclo se contienen entre sí y comparten bitmap.
+    """
+
+    def __init__(self, levels: BomLevels):
+        start = time.perf_counter()
+        snapshot = levels.snapshot
+        n = snapshot.node_count
+
+        self.levels = levels
+        self.computed_at = datetime.now()
+
+        child_count = np.diff(snapshot.child_offsets)
+        parent_count = np.diff(snapshot.parent_offsets)
+        products = np.flatnonzero((parent_count == 0) & (child_count > 0)).tolist()
+        products.sort(key=lambda i: snapshot.codes[i])
+
+        self.products: List[int] = products
+        self.product_bit: Dict[str, int] = {snapshot.codes[i]: k for k, i in enumerate(products)}
+
+        own = [0] * n
+        for k, i in enumerate(products):
+            own[i] = 1 << k
+
+        low_level_code = levels.low_level_code
+        parent_offsets = snapshot.parent_offsets.tolist()
+        parent_idx = snapshot.parent_idx.tolist()
+
+        cycles_by_level = {}
+        for component in levels.cycles:
+            cycles_by_level.setdefault(int(low_level_code[component[0]]), []).append(component)
+
+        # contains[i] | own[i]: productos que contienen a i o que son i
+        reach = own[:]
+        bitmaps = [0] * n
+
+        for level, nodes in levels.iter_levels():
+            for i in nodes.tolist():
+                bitmap = 0
+                for p in parent_idx[parent_offsets[i]:parent_offsets[i + 1]]:
+                    bitmap |= reach[p]
+                bitmaps[i] = bitmap
+                reach[i] = bitmap | own[i]
+
+            for component in cycles_by_level.get(level, ()):
+                bitmap = 0
+                for i in component:
+                    bitmap |= bitmaps[i]
+                for i in component:
+                    bitmaps[i] = bitmap
+                    reach[i] = bitmap | own[i]
+
+        self.bitmaps: List[int] = bitmaps
+        self.product_count = np.fromiter((b.bit_count() for b in bitmaps), dtype=np.int32, count=n)
+
+        # Dueño de los componentes que están en un solo producto (-1 si no)
+        self.unique_owner = np.fromiter(
+            (b.bit_length() - 1 if c == 1 else -1 for b, c in zip(bitmaps, self.product_count.tolist())),
+            dtype=np.int32,
+            count=n,
+        )
+
+        self.build_ms = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(
+            f"Componentes compartidos de la foto v{snapshot.version}: {len(products)} productos, "
+            f"{int((self.product_count > 0).sum())} componentes, {self.build_ms} ms"
+        )
+
+    def _product_codes(self, bitmap: int) -> List[str]:
+        codes = self.levels.snapshot.codes
+        return [codes[self.products[k]] for k in _bits(bitmap)]
+
+    def used_by_at_least(self, min_products: int) -> List[dict]:
+        codes = self.levels.snapshot.codes
+        ids = np.flatnonzero(self.product_count >= max(min_products, 1))
+        ids = ids[np.argsort(-self.product_count[ids], kind="stable")]
+        return [{"codigo": codes[i], "productos": int(self.product_count[i])} for i in ids.tolist()]
+
+    def unique_to(self, product: str) -> Optional[List[str]]:
+        """
+        Componentes que solo aparecen en `product`. None si no es un
+        producto de primer nivel.
+        """
+        k = self.product_bit.get(product)
+        if k is None:
+            return None
+        codes = self.levels.snapshot.codes
+        return sorted(codes[i] for i in np.flatnonzero(self.unique_owner == k).tolist())
+
+    def products_containing(self, components: List[str]) -> Dict:
+        """
+        Productos que contienen todos los `components` (AND de sus bitmaps).
+        """
+        index = self.levels.snapshot.index
+        faltantes = [c for c in components if c not in index]
+        if faltantes or not components:
+            return {"productos": [], "no_encontrados": faltantes}
+
+        bitmap = -1
+        for code in components:
+            bitmap &= self.bitmaps[index[code]]
+            if not bitmap:
+                break
+
+        return {"productos": self._product_codes(bitmap), "no_encontrados": []}
+
+    def stats(self) -> dict:
+        return {
+            "snapshot_version": self.levels.snapshot.version,
+            "computed_at": self.computed_at.isoformat(timespec="seconds"),
+            "products": len(self.products),
+            "components": int((self.product_count > 0).sum()),
+            "bitmap_bytes": sum((b.bit_length() + 7) // 8 for b in self.bitmaps),
+            "build_ms": self.build_ms,
+        }
+
+
+_shared: Optional[SharedComponents] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_components() -> SharedComponents:
+    """
+    Devuelve los bitmaps de la foto vigente. Se recalculan la primera vez
+    que se piden después de que cambian los low-level codes.
+    """
+    global _shared
+
+    levels = get_bom_levels()
+    shared = _shared
+    if shared is not None and shared.levels is levels:
+        return shared
+
+    with _shared_lock:
+        if _shared is not None and _shared.levels is levels:
+            return _shared
+        _shared = SharedComponents(levels)
+        return _shared
+
+
+def get_common_components(min_productos: int, limit: int = 500) -> Dict:
+    shared = get_shared_components()
+    componentes = shared.used_by_at_least(min_productos)
+
+    return {
+        "min_productos": min_productos,
+        "total": len(componentes),
+        "componentes": componentes[:limit],
+        "productos": len(shared.products),
+    }
+
+
+def get_unique_components(producto: str) -> Dict:
+    code = normalize_code(producto)
+    componentes = get_shared_components().unique_to(code)
+
+    return {
+        "producto": code,
+        "es_producto": componentes is not None,
+        "total": len(componentes or []),
+        "componentes": componentes or [],
+    }
+
+
+def get_products_containing(componentes: List[str]) -> Dict:
+    codes = list(dict.fromkeys(normalize_code(c) for c in componentes if c and c.strip()))
+    result = get_shared_components().products_containing(codes)
+
+    return {
+        "componentes": codes,
+        "total": len(result["productos"]),
+        **result,
+    }
+
+
+def get_shared_components_stats() -> Dict:
+    shared = _shared
+    return {
+        "computed": shared is not None,
+        **(shared.stats() if shared is not None else {}),
+    }
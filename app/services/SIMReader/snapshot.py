@@ -0,0 +1,574 @@
+import os
+import sys
+import time
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from dotenv import load_dotenv
+
+from app.database import get_sim_db
+from app.services.SIMReader.informix import normalize_code, fetch_in_chunks
+from app.services.SIMReader.merkle import subtree_hashes
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+load_dotenv()
+
+logger = get_logger(LogArea.SIM, LogCategory.SIMSTRUCTURE)
+
+SNAPSHOT_ENABLED = os.getenv("SIM_BOM_SNAPSHOT", "false").lower() == "true"
+SNAPSHOT_REFRESH_MINUTES = float(os.getenv("SIM_BOM_SNAPSHOT_REFRESH_MINUTES", 30))
+# Cada cuántos refrescos incrementales se fuerza una recarga completa
+SNAPSHOT_FULL_EVERY = int(os.getenv("SIM_BOM_SNAPSHOT_FULL_EVERY", 24))
+# Días hacia atrás desde el último refresco en los que se buscan filas dadas de baja
+SNAPSHOT_CLOSED_LOOKBACK_DAYS = int(os.getenv("SIM_BOM_SNAPSHOT_CLOSED_LOOKBACK_DAYS", 7))
+
+# Filas leídas por viaje al traer manufact.est completa
+FETCH_BATCH_SIZE = 5000
+
+
+class BomSnapshot:
+    """
+    Foto inmutable de las filas activas de manufact.est (est_fechas IS NULL).
+
+    Cada código se interna una sola vez y se identifica por un entero.
+    Las relaciones se guardan como arreglos CSR:
+        - hijos de i:  child_idx[child_offsets[i]:child_offsets[i + 1]]
+          (con su est_cantid y est_numord en child_qty / child_numord,
+          ordenados por est_numord)
+        - padres de i: parent_idx[parent_offsets[i]:parent_offsets[i + 1]]
+          (con la cantidad de la relación en parent_qty)
+
+    El hash de cada subárbol (ver merkle.py) se calcula una sola vez por
+    foto, la primera vez que se pide.
+    """
+
+    def __init__(
+        self,
+        codes: List[str],
+        child_offsets: np.ndarray,
+        child_idx: np.ndarray,
+        child_qty: np.ndarray,
+        child_numord: np.ndarray,
+        parent_offsets: np.ndarray,
+        parent_idx: np.ndarray,
+        parent_qty: np.ndarray,
+        version: int = 1,
+    ):
+        self.codes = codes
+        self.index = {code: i for i, code in enumerate(codes)}
+
+        self.child_offsets = child_offsets
+        self.child_idx = child_idx
+        self.child_qty = child_qty
+        self.child_numord = child_numord
+
+        self.parent_offsets = parent_offsets
+        self.parent_idx = parent_idx
+        self.parent_qty = parent_qty
+
+        self.version = version
+        self.loaded_at = datetime.now()
+
+        self._hashes = None
+        self._hash_seed = None
+        self._hash_lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows, version: int = 1) -> "BomSnapshot":
+        """
+        Construye la foto a partir de filas (padre, hijo, cantidad, numord)
+        con los códigos ya normalizados.
+        """
+        index = {}
+        codes = []
+
+        def intern(code):
+            i = index.get(code)
+            if i is None:
+                i = len(codes)
+                index[code] = i
+                codes.append(sys.intern(code))
+            return i
+
+        padres, hijos, cantidades, numords = _rows_to_lists(rows, intern)
+
+        return cls._build(
+            codes,
+            np.asarray(padres, dtype=np.int32),
+            np.asarray(hijos, dtype=np.int32),
+            np.asarray(cantidades, dtype=np.float64),
+            np.asarray(numords, dtype=np.int32),
+            version,
+        )
+
+    def patched(self, changed: dict, version: int) -> "BomSnapshot":
+        """
+        Devuelve una foto nueva en la que los hijos de cada padre de `changed`
+        se reemplazan por las filas (hijo, cantidad, numord) indicadas.
+        El resto de las relaciones se copia tal cual desde esta foto.
+        """
+        index = dict(self.index)
+        codes = list(self.codes)
+
+        def intern(code):
+            i = index.get(code)
+            if i is None:
+                i = len(codes)
+                index[code] = i
+                codes.append(sys.intern(code))
+            return i
+
+        n_old = len(self.codes)
+        padres_old = np.repeat(
+            np.arange(n_old, dtype=np.int32),
+            np.diff(self.child_offsets).astype(np.int64)
+        )
+        changed_ids = np.asarray(
+            [self.index[p] for p in changed if p in self.index], dtype=np.int32
+        )
+        keep = ~np.isin(padres_old, changed_ids)
+
+        new_rows = (
+            (padre, hijo, cantid, numord)
+            for padre, filas in changed.items()
+            for hijo, cantid, numord in filas
+        )
+        padres, hijos, cantidades, numords = _rows_to_lists(new_rows, intern)
+
+        return BomSnapshot._build(
+            codes,
+            np.concatenate([padres_old[keep], np.asarray(padres, dtype=np.int32)]),
+            np.concatenate([self.child_idx[keep], np.asarray(hijos, dtype=np.int32)]),
+            np.concatenate([self.child_qty[keep], np.asarray(cantidades, dtype=np.float64)]),
+            np.concatenate([self.child_numord[keep], np.asarray(numords, dtype=np.int32)]),
+            version,
+        )
+
+    @classmethod
+    def _build(cls, codes, padres, hijos, cantidades, numords, version) -> "BomSnapshot":
+        n = len(codes)
+
+        # Hijos agrupados por padre y ordenados por est_numord
+        order = np.lexsort((numords, padres))
+        child_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(padres, minlength=n), out=child_offsets[1:])
+
+        # Padres agrupados por hijo (orden estable)
+        porder = np.argsort(hijos, kind="stable")
+        parent_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(hijos, minlength=n), out=parent_offsets[1:])
+
+        return cls(
+            codes=codes,
+            child_offsets=child_offsets,
+            child_idx=hijos[order],
+            child_qty=cantidades[order],
+            child_numord=numords[order],
+            parent_offsets=parent_offsets,
+            parent_idx=padres[porder],
+            parent_qty=cantidades[porder],
+            version=version,
+        )
+
+    @property
+    def node_count(self) -> int:
+        return len(self.codes)
+
+    @property
+    def edge_count(self) -> int:
+        return int(self.child_idx.shape[0])
+
+    def children(self, code: str) -> List[Tuple[str, float, int]]:
+        """
+        Hijos directos de `code` como (hijo, cantidad, numord).
+        """
+        i = self.index.get(code)
+        if i is None:
+            return []
+
+        start, end = self.child_offsets[i], self.child_offsets[i + 1]
+        codes = self.codes
+        return [
+            (codes[j], q, n)
+            for j, q, n in zip(
+                self.child_idx[start:end].tolist(),
+                self.child_qty[start:end].tolist(),
+                self.child_numord[start:end].tolist(),
+            )
+        ]
+
+    def parents(self, code: str) -> List[str]:
+        """
+        Padres directos de `code`.
+        """
+        i = self.index.get(code)
+        if i is None:
+            return []
+
+        start, end = self.parent_offsets[i], self.parent_offsets[i + 1]
+        codes = self.codes
+        return [codes[j] for j in self.parent_idx[start:end].tolist()]
+
+    def subtree_hashes(self) -> Dict[str, str]:
+        """
+        Hash de subárbol de todos los códigos de la foto.
+        """
+        if self._hashes is None:
+            with self._hash_lock:
+                if self._hashes is None:
+                    start = time.perf_counter()
+                    self._hashes = subtree_hashes(
+                        self.codes,
+                        lambda code: [(hijo, cantid) for hijo, cantid, _ in self.children(code)],
+                        known=self._hash_seed,
+                    )
+                    self._hash_seed = None
+                    logger.debug(
+                        f"Hashes de la foto v{self.version} calculados: "
+                        f"{len(self._hashes)} códigos, {(time.perf_counter() - start) * 1000:.2f} ms"
+                    )
+        return self._hashes
+
+    def subtree_hash(self, code: str) -> Optional[str]:
+        return self.subtree_hashes().get(code)
+
+    def inherit_hashes(self, previous: "BomSnapshot", changed_parents):
+        """
+        Reutiliza los hashes ya calculados de `previous` para los códigos que
+        no son ni un padre cambiado ni ancestro de uno; solo esos se recalculan.
+        """
+        if previous._hashes is None:
+            return
+
+        dirty = np.zeros(self.node_count, dtype=bool)
+        frontier = np.asarray(
+            [self.index[p] for p in changed_parents if p in self.index], dtype=np.int64
+        )
+        dirty[frontier] = True
+
+        while frontier.size:
+            padres = np.unique(np.concatenate([
+                self.parent_idx[self.parent_offsets[i]:self.parent_offsets[i + 1]]
+                for i in frontier.tolist()
+            ]))
+            padres = padres[~dirty[padres]]
+            dirty[padres] = True
+            frontier = padres.astype(np.int64)
+
+        index = self.index
+        self._hash_seed = {
+            code: h
+            for code, h in previous._hashes.items()
+            if code in index and not dirty[index[code]]
+        }
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at.isoformat(timespec="seconds"),
+            "nodes": self.node_count,
+            "edges": self.edge_count,
+        }
+
+
+def _rows_to_lists(rows, intern):
+    padres, hijos, cantidades, numords = [], [], [], []
+    for padre, hijo, cantid, numord in rows:
+        if not padre or not hijo:
+            continue
+        padres.append(intern(padre))
+        hijos.append(intern(hijo))
+        cantidades.append(float(cantid) if cantid is not None else 0.0)
+        numords.append(int(numord) if numord is not None else 0)
+    return padres, hijos, cantidades, numords
+
+
+_snapshot: Optional[BomSnapshot] = None
+_refresh_lock = threading.Lock()
+_last_refresh = {}
+_refresh_history = deque(maxlen=50)
+
+# Funciones a notificar cuando se publica una foto nueva
+_listeners = []
+
+# Firma por padre vista en el último refresco: padre -> tupla de agregados
+_signatures = {}
+# Fecha en la que se tomaron esas firmas
+_signatures_date: Optional[date] = None
+_refreshes_since_full = 0
+
+
+def get_bom_snapshot() -> Optional[BomSnapshot]:
+    """
+    Devuelve la foto vigente o None si está deshabilitada o aún no terminó
+    la primera carga (en ese caso se debe consultar Informix en vivo).
+    """
+    return _snapshot
+
+
+def _publish(snapshot: BomSnapshot):
+    """
+    Reemplaza la foto vigente. La asignación de la referencia es atómica,
+    los lectores ven la foto anterior o la nueva completa.
+    """
+    global _snapshot
+    _snapshot = snapshot
+
+
+def add_refresh_listener(listener):
+    """
+    Registra una función listener(anterior, nueva, padres_cambiados) que se
+    llama tras publicar cada foto. `padres_cambiados` es None en las
+    recargas completas.
+    """
+    _listeners.append(listener)
+
+
+def _notify(previous, snapshot, changed_parents):
+    for listener in _listeners:
+        try:
+            listener(previous, snapshot, changed_parents)
+        except Exception:
+            logger.exception("Error en listener de la foto de estructuras")
+
+
+def fetch_est_rows(cursor) -> list:
+    """
+    Relaciones activas de manufact.est como (padre, hijo, cantidad, orden),
+    con los códigos normalizados. Es la entrada de BomSnapshot.from_rows.
+    """
+    cursor.execute(
+        """
+        SELECT TRIM(est_padre), TRIM(est_hijo), est_cantid, est_numord
+        FROM manufact.est
+        WHERE est_fechas IS NULL
+        """
+    )
+
+    rows = []
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        for padre, hijo, cantid, numord in batch:
+            rows.append((normalize_code(padre), normalize_code(hijo), cantid, numord))
+
+    return rows
+
+
+def _fetch_parent_signatures(cursor) -> dict:
+    """
+    Calcula en Informix una firma por padre con la cantidad de filas
+    activas y sumas de control sobre cantidades, orden e hijos.
+    Si la firma de un padre cambia, sus hijos se vuelven a leer.
+    """
+    cursor.execute(
+        """
+        SELECT est_padre, COUNT(*), SUM(est_cantid), SUM(est_numord),
+            SUM(est_cantid * est_numord), MIN(est_hijo), MAX(est_hijo)
+        FROM manufact.est
+        WHERE est_fechas IS NULL
+        GROUP BY est_padre
+        """
+    )
+
+    signatures = {}
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        for padre, count, sum_qty, sum_ord, sum_mix, min_hijo, max_hijo in batch:
+            signatures[normalize_code(padre)] = (
+                int(count),
+                round(float(sum_qty or 0), 6),
+                int(sum_ord or 0),
+                round(float(sum_mix or 0), 6),
+                normalize_code(min_hijo),
+                normalize_code(max_hijo),
+            )
+
+    return signatures
+
+
+def _fetch_parents_with_closed_rows(cursor, since: date) -> set:
+    """
+    Padres con alguna fila dada de baja (est_fechas) desde `since`.
+
+    La firma no distingue un hijo reemplazado por otro código con la misma
+    cantidad y posición; en SIM ese reemplazo da de baja la fila anterior y
+    agrega una nueva, así que estos padres se vuelven a leer siempre.
+    """
+    cursor.execute(
+        """
+        SELECT DISTINCT TRIM(est_padre)
+        FROM manufact.est
+        WHERE est_fechas >= ?
+        """,
+        [since]
+    )
+    return {normalize_code(padre) for (padre,) in cursor.fetchall()}
+
+
+def _fetch_rows_for_parents(cursor, padres: list) -> dict:
+    """
+    Trae las filas activas de los padres indicados, en bloques IN.
+    """
+    changed = {padre: [] for padre in padres}
+
+    chunks = fetch_in_chunks(
+        cursor,
+        """
+        SELECT TRIM(est_padre), TRIM(est_hijo), est_cantid, est_numord
+        FROM manufact.est
+        WHERE est_padre IN ({placeholders}) AND est_fechas IS NULL
+        """,
+        padres,
+    )
+    for rows in chunks:
+        for padre, hijo, cantid, numord in rows:
+            padre = normalize_code(padre)
+            if padre in changed:
+                changed[padre].append((normalize_code(hijo), cantid, numord))
+
+    return changed
+
+
+def _record_refresh(mode: str, snapshot: BomSnapshot, changed_parents, elapsed: float):
+    entry = {
+        "mode": mode,
+        "version": snapshot.version,
+        "changed_parents": changed_parents,
+        "ms": round(elapsed, 2),
+        "at": datetime.now().isoformat(timespec="seconds"),
+    }
+    _last_refresh.clear()
+    _last_refresh.update(entry)
+    _refresh_history.append(entry)
+
+
+def refresh_bom_snapshot(incremental: bool = False) -> BomSnapshot:
+    """
+    Refresca la foto y la publica. Las recargas se serializan.
+
+    Con `incremental=True` solo se vuelven a leer los padres cuya firma
+    cambió desde el último refresco o que tienen filas dadas de baja en los
+    últimos SNAPSHOT_CLOSED_LOOKBACK_DAYS días. Si no hay foto previa, o pasaron
+    SNAPSHOT_FULL_EVERY refrescos incrementales, se hace una recarga completa.
+    """
+    global _signatures, _signatures_date, _refreshes_since_full
+
+    with _refresh_lock:
+        start = time.perf_counter()
+        current = _snapshot
+        version = current.version + 1 if current else 1
+
+        full = (
+            not incremental
+            or current is None
+            or _refreshes_since_full >= SNAPSHOT_FULL_EVERY
+        )
+
+        with get_sim_db() as conn:
+            cursor = conn.cursor()
+            signatures = _fetch_parent_signatures(cursor)
+
+            if full:
+                snapshot = BomSnapshot.from_rows(fetch_est_rows(cursor), version=version)
+                changed = None
+                changed_parents = None
+            else:
+                changed = {
+                    padre
+                    for padre in signatures.keys() | _signatures.keys()
+                    if signatures.get(padre) != _signatures.get(padre)
+                }
+                since = (_signatures_date or date.today()) - timedelta(days=SNAPSHOT_CLOSED_LOOKBACK_DAYS)
+                changed |= _fetch_parents_with_closed_rows(cursor, since) & (signatures.keys() | _signatures.keys())
+                changed = sorted(changed)
+                changed_parents = len(changed)
+
+                if not changed:
+                    _signatures = signatures
+                    _signatures_date = date.today()
+                    _refreshes_since_full += 1
+                    elapsed = (time.perf_counter() - start) * 1000
+                    _record_refresh("incremental", current, 0, elapsed)
+                    logger.info(f"Foto de estructuras v{current.version} sin cambios ({elapsed:.2f} ms)")
+                    return current
+
+                snapshot = current.patched(
+                    _fetch_rows_for_parents(cursor, changed),
+                    version=version
+                )
+                snapshot.inherit_hashes(current, changed)
+
+        # Los hashes se calculan antes de publicar para que ningún request pague ese costo
+        snapshot.subtree_hashes()
+
+        _signatures = signatures
+        _signatures_date = date.today()
+        _refreshes_since_full = 0 if full else _refreshes_since_full + 1
+        _publish(snapshot)
+        _notify(current, snapshot, changed)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        _record_refresh("full" if full else "incremental", snapshot, changed_parents, elapsed)
+
+        logger.info(
+            f"Foto de estructuras v{snapshot.version} publicada "
+            f"({'completa' if full else f'incremental, {changed_parents} padres cambiados'}): "
+            f"{snapshot.node_count} códigos, {snapshot.edge_count} relaciones, {elapsed:.2f} ms"
+        )
+
+        return snapshot
+
+
+def _refresh_job():
+    try:
+        refresh_bom_snapshot(incremental=True)
+    except Exception:
+        logger.exception("Error al refrescar la foto de estructuras")
+
+
+def get_bom_snapshot_stats() -> dict:
+    """
+    Estado de la foto de estructuras para diagnóstico.
+    """
+    snapshot = _snapshot
+    return {
+        "enabled": SNAPSHOT_ENABLED,
+        "refresh_minutes": SNAPSHOT_REFRESH_MINUTES,
+        "full_every": SNAPSHOT_FULL_EVERY,
+        "snapshot": snapshot.stats() if snapshot else None,
+        "last_refresh": dict(_last_refresh),
+        "history": list(_refresh_history),
+    }
+
+
+def start_bom_snapshot_scheduler():
+    """
+    Scheduler que carga la foto al arrancar y la refresca periódicamente.
+    Retorna None si la foto está deshabilitada.
+    """
+    if not SNAPSHOT_ENABLED:
+        logger.info("Foto de estructuras deshabilitada (SIM_BOM_SNAPSHOT=false)")
+        return None
+
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        _refresh_job,
+        IntervalTrigger(minutes=SNAPSHOT_REFRESH_MINUTES),
+        id="bom_snapshot_refresh_job",
+        next_run_time=datetime.now(),
+        max_instances=1,
+        coalesce=True,
+    )
+    scheduler.start()
+
+    logger.info("Scheduler de foto de estructuras iniciado")
+    return scheduler
@@ -0,0 +1,183 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List
+
+from app.database import get_sim_db
+from app.services.SIMReader.informix import normalize_code, fetch_in_chunks
+from app.services.SIMReader.snapshot import get_bom_snapshot
+
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+logger = get_logger(LogArea.SIM, LogCategory.SIMSTRUCTURE)
+
+# Resultados recordados por (código, versión de la foto)
+WHERE_USED_CACHE_SIZE = 2048
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _ancestor_edges_from_snapshot(snapshot, code: str) -> list:
+    """
+    Relaciones (padre, hijo, cantidad) de todos los ancestros de `code`,
+    recorriendo los arreglos de padres de la foto.
+    """
+    start_id = snapshot.index.get(code)
+    if start_id is None:
+        return []
+
+    codes = snapshot.codes
+    offsets = snapshot.parent_offsets
+    parent_idx = snapshot.parent_idx
+    parent_qty = snapshot.parent_qty
+
+    edges = []
+    seen = {start_id}
+    queue = deque([start_id])
+
+    while queue:
+        i = queue.popleft()
+        start, end = offsets[i], offsets[i + 1]
+        for p, q in zip(parent_idx[start:end].tolist(), parent_qty[start:end].tolist()):
+            edges.append((codes[p], codes[i], q))
+            if p not in seen:
+                seen.add(p)
+                queue.append(p)
+
+    return edges
+
+
+def _ancestor_edges_from_db(code: str) -> list:
+    """
+    Relaciones (padre, hijo, cantidad) de todos los ancestros de `code`,
+    trayendo cada nivel con una consulta `est_hijo IN (...)`.
+    """
+    edges = []
+    frontier = [code]
+    seen = {code}
+
+    with get_sim_db() as conn:
+        cursor = conn.cursor()
+
+        while frontier:
+            next_frontier = []
+
+            chunks = fetch_in_chunks(
+                cursor,
+                """
+                SELECT TRIM(est_padre), TRIM(est_hijo), est_cantid
+                FROM manufact.est
+                WHERE est_fechas IS NULL
+                    AND est_hijo IN ({placeholders})
+                """,
+                frontier,
+            )
+            for rows in chunks:
+                for padre, hijo, cantid in rows:
+                    padre = normalize_code(padre)
+                    if not padre:
+                        continue
+                    edges.append((padre, normalize_code(hijo), float(cantid or 0)))
+                    if padre not in seen:
+                        seen.add(padre)
+                        next_frontier.append(padre)
+
+            frontier = next_frontier
+
+    return edges
+
+
+def _aggregate(code: str, edges: list) -> Dict[str, Any]:
+    """
+    Propaga la cantidad del componente hacia arriba en orden topológico:
+    cantidad(padre) = Σ cantidad(relación padre→hijo) × cantidad(hijo).
+    Así cada camino se multiplica y los caminos paralelos se suman.
+    """
+    parents_of = {}
+    pending = {}
+    for padre, hijo, cantid in edges:
+        parents_of.setdefault(hijo, []).append((padre, cantid))
+        pending[padre] = pending.get(padre, 0) + 1
+
+    cantidades = {code: 1.0}
+    niveles = {code: 0}
+    queue = deque([code])
+
+    while queue:
+        hijo = queue.popleft()
+        for padre, cantid in parents_of.get(hijo, ()):
+            cantidades[padre] = cantidades.get(padre, 0.0) + cantid * cantidades[hijo]
+            niveles[padre] = max(niveles.get(padre, 0), niveles[hijo] + 1)
+            pending[padre] -= 1
+            if pending[padre] == 0:
+                queue.append(padre)
+
+    # Los padres que nunca completaron sus hijos están en un ciclo o encima de uno
+    ciclos = sorted(padre for padre, restantes in pending.items() if restantes > 0)
+
+    results = [
+        {
+            "codigo": padre,
+            "cantidad": round(cantidades[padre], 6),
+            "nivel": niveles[padre],
+            "producto_final": padre not in parents_of,
+        }
+        for padre in cantidades
+        if padre != code and padre not in ciclos
+    ]
+    results.sort(key=lambda r: (r["nivel"], r["codigo"]))
+
+    return {
+        "codigo": code,
+        "total": len(results),
+        "productos_finales": [r["codigo"] for r in results if r["producto_final"]],
+        "results": results,
+        "ciclos": ciclos,
+    }
+
+
+def get_where_used(hijo_code: str) -> Dict[str, Any]:
+    """
+    Devuelve todos los conjuntos y productos finales que usan un componente,
+    con la cantidad del componente por unidad de cada uno (multiplicada a lo
+    largo de cada camino y sumada entre caminos paralelos).
+
+    Con la foto de estructuras cargada el resultado se recuerda por versión
+    de la foto, así consultar de nuevo el mismo componente no recorre nada.
+    """
+    code = normalize_code(hijo_code)
+    start = time.perf_counter()
+
+    snapshot = get_bom_snapshot()
+
+    if snapshot is not None:
+        key = (code, snapshot.version)
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is not None:
+                _cache.move_to_end(key)
+                logger.debug(f"get_where_used resuelto desde cache para {code}")
+                return cached
+
+        edges = _ancestor_edges_from_snapshot(snapshot, code)
+    else:
+        edges = _ancestor_edges_from_db(code)
+
+    result = _aggregate(code, edges)
+
+    if result["ciclos"]:
+        logger.warning(f"get_where_used: ciclo detectado sobre {code}: {result['ciclos']}")
+
+    if snapshot is not None:
+        with _cache_lock:
+            _cache[key] = result
+            while len(_cache) > WHERE_USED_CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    logger.debug(
+        f"get_where_used finalizado para {code}: {result['total']} ancestros, "
+        f"{len(edges)} relaciones, {(time.perf_counter() - start) * 1000:.2f} ms"
+    )
+
+    return result
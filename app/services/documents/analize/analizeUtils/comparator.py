@@ -2,7 +2,7 @@ from typing import Dict, List, Any
 from fastapi import HTTPException
 from collections import Counter
 
-from app.services.SIMReader.estructura import get_all_hijos
+from app.services.SIMReader.estructura import get_all_hijos_cached
 
 from ___loggin___.config import LogArea, LogCategory
 from ___loggin___.logger import get_logger
@@ -52,7 +52,8 @@ async def CompareExtractedCodesWithStructure(
     )
 
     try:
-        structure_data = get_all_hijos(MainCode)
+        structure_data, _, cache_status = get_all_hijos_cached(MainCode)
+        logger.debug(f"Estructura de {MainCode} obtenida (cache={cache_status})")
 
         if not structure_data:
             logger.warning(
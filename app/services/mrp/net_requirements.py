@@ -0,0 +1,191 @@
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import Item, Structure, WarehouseStock, ProductionOrder, ProductionConsumption
+from app.services.SIMReader.low_level import compute_low_level_codes
+from app.services.SIMReader.csr import edge_positions
+
+from ___loggin___.logger import get_logger, LogArea, LogCategory
+
+logger = get_logger(LogArea.SERVICES, LogCategory.MRP)
+
+# Órdenes que todavía generan necesidades de materiales
+OPEN_ORDER_STATUSES = ("planned", "in_progress")
+
+
+def _load(db: Session) -> Dict[str, list]:
+    """
+    Trae todo lo necesario con una consulta agregada por tabla.
+    """
+    structure = db.query(
+        Structure.parent_item_id,
+        Structure.component_item_id,
+        Structure.quantity,
+    ).all()
+
+    orders = db.query(
+        ProductionOrder.item_id,
+        func.sum(ProductionOrder.quantity),
+        func.count(ProductionOrder.id),
+    ).filter(
+        ProductionOrder.status.in_(OPEN_ORDER_STATUSES)
+    ).group_by(ProductionOrder.item_id).all()
+
+    consumed = db.query(
+        ProductionConsumption.item_id,
+        func.sum(ProductionConsumption.quantity_used),
+    ).join(
+        ProductionOrder, ProductionConsumption.production_order_id == ProductionOrder.id
+    ).filter(
+        ProductionOrder.status.in_(OPEN_ORDER_STATUSES)
+    ).group_by(ProductionConsumption.item_id).all()
+
+    stock = db.query(
+        WarehouseStock.item_id,
+        func.sum(WarehouseStock.quantity),
+    ).group_by(WarehouseStock.item_id).all()
+
+    return {
+        "structure": structure,
+        "orders": orders,
+        "consumed": consumed,
+        "stock": stock,
+    }
+
+
+def _scatter(index: Dict[int, int], n: int, rows) -> np.ndarray:
+    values = np.zeros(n, dtype=np.float64)
+    for item_id, qty in rows:
+        values[index[item_id]] += float(qty or 0)
+    return values
+
+
+def run_net_requirements(db: Session, include_zero: bool = False) -> Dict[str, Any]:
+    """
+    Cálculo de necesidades netas (MRP) para las órdenes de producción abiertas.
+
+    Las órdenes abiertas se explotan nivel por nivel según el low-level code
+    de cada artículo, así cada artículo se procesa una sola vez y con toda
+    su demanda ya acumulada. En cada nivel:
+
+        bruta      = demanda de los padres - lo ya consumido por órdenes abiertas
+        disponible = stock sumado entre ubicaciones + órdenes abiertas del artículo
+        neta       = max(0, bruta - disponible)
+
+    Se fabrica la cantidad de las órdenes abiertas más la neta, y eso se
+    explota hacia los componentes del nivel siguiente (lote a lote).
+    Las relaciones que forman un ciclo no se explotan y se informan aparte.
+    """
+    start = time.perf_counter()
+    data = _load(db)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    item_ids = sorted(
+        {p for p, _, _ in data["structure"]}
+        | {c for _, c, _ in data["structure"]}
+        | {i for i, _, _ in data["orders"]}
+    )
+    index = {item_id: i for i, item_id in enumerate(item_ids)}
+    n = len(item_ids)
+    ids = np.asarray(item_ids, dtype=np.int64)
+
+    src = np.asarray([index[p] for p, _, _ in data["structure"]], dtype=np.int64)
+    dst = np.asarray([index[c] for _, c, _ in data["structure"]], dtype=np.int64)
+    qty = np.asarray([float(q or 0) for _, _, q in data["structure"]], dtype=np.float64)
+
+    # Relaciones agrupadas por padre (CSR)
+    order = np.argsort(src, kind="stable")
+    targets = dst[order]
+    edge_qty = qty[order]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+
+    levels, cycles = compute_low_level_codes(n, offsets, targets)
+
+    # Una relación que no baja de nivel está dentro de un ciclo
+    owners = np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))
+    edge_ok = levels[targets] > levels[owners]
+
+    orders = np.zeros(n, dtype=np.float64)
+    order_count = np.zeros(n, dtype=np.int64)
+    for item_id, total, count in data["orders"]:
+        orders[index[item_id]] = float(total or 0)
+        order_count[index[item_id]] = int(count)
+
+    stock_rows = [(i, q) for i, q in data["stock"] if i in index]
+    consumed_rows = [(i, q) for i, q in data["consumed"] if i in index]
+    on_hand = _scatter(index, n, stock_rows)
+    consumed = _scatter(index, n, consumed_rows)
+
+    demand = np.zeros(n, dtype=np.float64)
+    gross = np.zeros(n, dtype=np.float64)
+    net = np.zeros(n, dtype=np.float64)
+    build = np.zeros(n, dtype=np.float64)
+
+    level_nodes = np.argsort(levels, kind="stable")
+    level_offsets = np.zeros(int(levels.max(initial=-1)) + 2, dtype=np.int64)
+    np.cumsum(np.bincount(levels, minlength=len(level_offsets) - 1), out=level_offsets[1:])
+
+    for level in range(len(level_offsets) - 1):
+        nodes = level_nodes[level_offsets[level]:level_offsets[level + 1]]
+        if not nodes.size:
+            continue
+
+        gross[nodes] = np.maximum(demand[nodes] - consumed[nodes], 0.0)
+        net[nodes] = np.maximum(gross[nodes] - on_hand[nodes] - orders[nodes], 0.0)
+        build[nodes] = orders[nodes] + net[nodes]
+
+        rep, pos = edge_positions(offsets, nodes.astype(np.int64))
+        keep = edge_ok[pos]
+        np.add.at(demand, targets[pos[keep]], build[nodes[rep[keep]]] * edge_qty[pos[keep]])
+
+    makes = np.diff(offsets) > 0
+    relevant = np.flatnonzero((gross > 0) | (orders > 0) | include_zero)
+
+    items = {
+        item.id: item
+        for item in db.query(Item.id, Item.code, Item.name).filter(Item.id.in_(ids[relevant].tolist())).all()
+    } if relevant.size else {}
+
+    results = []
+    for i in relevant.tolist():
+        item = items.get(int(ids[i]))
+        results.append({
+            "item_id": int(ids[i]),
+            "code": item.code if item else None,
+            "name": item.name if item else None,
+            "low_level_code": int(levels[i]),
+            "make": bool(makes[i]),
+            "open_orders": int(order_count[i]),
+            "ordered": round(float(orders[i]), 4),
+            "gross": round(float(gross[i]), 4),
+            "consumed": round(float(consumed[i]), 4),
+            "on_hand": round(float(on_hand[i]), 4),
+            "net": round(float(net[i]), 4),
+        })
+    results.sort(key=lambda r: (r["low_level_code"], r["code"] or ""))
+
+    ciclos = [sorted(int(ids[i]) for i in component) for component in cycles]
+    if ciclos:
+        logger.warning(f"MRP: relaciones en ciclo no explotadas entre los ítems {ciclos}")
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(
+        f"MRP finalizado: {int(order_count.sum())} órdenes abiertas, {n} ítems, "
+        f"{len(level_offsets) - 1} niveles, {int((net > 0).sum())} con necesidad neta | "
+        f"carga {load_ms:.2f} ms, total {elapsed_ms:.2f} ms"
+    )
+
+    return {
+        "open_orders": int(order_count.sum()),
+        "items": n,
+        "levels": len(level_offsets) - 1,
+        "total": len(results),
+        "results": results,
+        "cycles": ciclos,
+        "elapsed_ms": round(elapsed_ms, 2),
+    }
@@ -0,0 +1,67 @@
+import pytest
+
+from app import database
+from app.database import SimConnectionPool, get_sim_db
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, *args):
+        if self.conn.closed:
+            raise database.pyodbc.Error("conexión cerrada")
+        return self
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if self.closed:
+            raise database.pyodbc.Error("conexión cerrada")
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    created = []
+
+    def connect():
+        created.append(FakeConnection())
+        return created[-1]
+
+    pool = SimConnectionPool(connect=connect, min_size=0, max_size=1, checkout_timeout=0.1)
+    monkeypatch.setattr(database, "_sim_pool", pool)
+    return pool, created
+
+
+def test_close_returns_connection_to_pool(pool):
+    pool, created = pool
+
+    with get_sim_db() as conn:
+        conn.close()
+        with pytest.raises(RuntimeError):
+            conn.cursor()
+
+    with get_sim_db() as conn:
+        conn.cursor().execute("SELECT 1 FROM systables WHERE tabid = 1")
+
+    assert len(created) == 1
+    assert not created[0].closed
+    stats = pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+    assert stats["discarded"] == 0
@@ -0,0 +1,61 @@
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from app.services.SIMReader import estructura
+from app.services.SIMReader.snapshot import BomSnapshot
+
+# (padre, hijo, cantidad, numord). Los subconjuntos S1 y S2 se comparten y
+# las filas no están cargadas en el orden de est_numord.
+EST_ROWS = [
+    ("P1", "S2", 1, 3),
+    ("P1", "S1", 2, 1),
+    ("P1", "C3", 5, 2),
+    ("S1", "C2", 4, 2),
+    ("S1", "S2", 1, 1),
+    ("S2", "C1", 3, 2),
+    ("S2", "C3", 6, 1),
+    ("C3", "C1", 1, 1),
+]
+
+
+@pytest.fixture
+def est_db(tmp_path):
+    path = tmp_path / "manufact.db"
+    setup = sqlite3.connect(path)
+    setup.execute(
+        "CREATE TABLE est (est_padre TEXT, est_hijo TEXT, est_cantid REAL, est_numord INT, est_fechas TEXT)"
+    )
+    setup.executemany("INSERT INTO est VALUES (?, ?, ?, ?, NULL)", EST_ROWS)
+    setup.commit()
+    setup.close()
+
+    @contextmanager
+    def get_sim_db():
+        conn = sqlite3.connect(":memory:")
+        conn.execute(f"ATTACH '{path}' AS manufact")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    return get_sim_db
+
+
+def _build(monkeypatch, snapshot, get_sim_db, batched=True):
+    monkeypatch.setattr(estructura, "get_bom_snapshot", lambda: snapshot)
+    monkeypatch.setattr(estructura, "get_sim_db", get_sim_db)
+    monkeypatch.setattr(estructura, "_articles_by_code", lambda codes: {})
+    return [node.to_dict() for node in estructura.get_all_hijos("P1", batched=batched)]
+
+
+def test_snapshot_and_live_trees_are_equal(monkeypatch, est_db):
+    snapshot = BomSnapshot.from_rows(EST_ROWS, version=1)
+
+    from_snapshot = _build(monkeypatch, snapshot, est_db)
+    por_nivel = _build(monkeypatch, None, est_db, batched=True)
+    por_nodo = _build(monkeypatch, None, est_db, batched=False)
+
+    assert por_nivel == from_snapshot
+    assert por_nodo == from_snapshot